@@ -0,0 +1,323 @@
+"""
+Micro-batching of supervisor routing calls across concurrent conversations.
+
+With many conversations running at once, every supervisor step is its own
+LLM request. A `RoutingBatcher` sends the routing requests that are queued
+together through the chain's `batch` API, with a bound on the number of
+requests in flight, and never holds a request back waiting for others. The
+chat model is rate limited per model name, shared by every batcher that uses
+the same model, and rate-limit, timeout and server errors are retried with
+exponential backoff and jitter. Bursts are smoothed instead of turning into
+429 storms.
+
+Configured in the "batching" section of the supervisor config:
+
+    "batching": {
+        "enabled": true,
+        "window_ms": 20,
+        "max_batch_size": 8,
+        "max_concurrency": 16,
+        "requests_per_second": 10,
+        "max_retries": 3
+    }
+"""
+import time
+import queue
+import asyncio
+import logging
+import weakref
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+from langchain_core.rate_limiters import InMemoryRateLimiter
+from langchain_core.runnables import Runnable, RunnableConfig
+from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Errors worth retrying; anything else (e.g. a malformed response) fails at once
+RETRYABLE_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+# One token bucket per model and rate, shared by every supervisor using it
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+def get_rate_limiter(model: str, requests_per_second: float) -> InMemoryRateLimiter:
+    """Returns the process-wide rate limiter for `model` at `requests_per_second`."""
+    key = (model, requests_per_second)
+    with _rate_limiters_lock:
+        if key not in _rate_limiters:
+            _rate_limiters[key] = InMemoryRateLimiter(
+                requests_per_second=requests_per_second,
+                check_every_n_seconds=min(0.1, 1 / requests_per_second),
+                # Allow short bursts of up to a second's worth of requests
+                max_bucket_size=max(1, requests_per_second),
+            )
+        return _rate_limiters[key]
+
+def _model_name(llm) -> str:
+    return getattr(llm, "model_name", None) or getattr(llm, "model", None) or llm._llm_type
+
+class RoutingBatcher:
+    """
+    Collects concurrent routing requests and runs them through `chain.batch`.
+
+    A batch is sent as soon as no more requests are queued: requests that
+    arrived together, or while earlier batches waited for room, go out
+    together, and a lone request is never held back. Sync callers are
+    batched on a collector thread with `chain.batch`, async callers on their
+    event loop with `chain.abatch`, so they keep using the async HTTP client.
+
+    Args:
+        chain (Runnable): The supervisor chain.
+        window_ms (float): Longest time spent collecting a batch while
+                           requests keep arriving.
+        max_batch_size (int): Maximum number of requests per batch; capped
+                              at `max_concurrency`.
+        max_concurrency (int): Maximum number of requests in flight, across
+                               all batches (per event loop for async callers).
+    """
+
+    def __init__(self, chain: Runnable, window_ms: float = 20.0, max_batch_size: int = 8,
+                 max_concurrency: int = 16):
+        self.chain = chain
+        self.window = window_ms / 1000
+        # A batch must fit in the in-flight limit, or it could never be dispatched
+        self.max_batch_size = max(1, min(max_batch_size, max_concurrency))
+        self.max_concurrency = max_concurrency
+        self._queue = queue.Queue()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._executor = None
+        self._collector = None
+        # Per event loop: its request queue, read by a collector task
+        self._loops = weakref.WeakKeyDictionary()
+        # Collector and dispatch tasks, referenced until they finish
+        self._tasks = set()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.requests = 0
+        self.batches = 0
+
+    @classmethod
+    def from_config(cls, config: Optional[dict], llm, make_chain: Callable[[object], Runnable]):
+        """
+        Creates a batcher from the supervisor's "batching" config section.
+
+        Args:
+            config (dict): The section, or None.
+            llm: The supervisor's chat model.
+            make_chain (Callable): Builds the supervisor chain for a chat
+                                   model; called with the rate-limited model.
+
+        Returns:
+            RoutingBatcher: The batcher, or None if the section is missing or disabled.
+        """
+        if not config or not config.get("enabled", True):
+            return None
+        if config.get("requests_per_second"):
+            limiter = get_rate_limiter(_model_name(llm), float(config["requests_per_second"]))
+            llm = llm.model_copy(update={"rate_limiter": limiter})
+        chain = make_chain(llm)
+        if config.get("max_retries", 3) > 0:
+            chain = chain.with_retry(
+                retry_if_exception_type=RETRYABLE_ERRORS,
+                wait_exponential_jitter=True,
+                stop_after_attempt=config.get("max_retries", 3) + 1,
+            )
+        return cls(
+            chain,
+            window_ms=config.get("window_ms", 20.0),
+            max_batch_size=config.get("max_batch_size", 8),
+            max_concurrency=config.get("max_concurrency", 16),
+        )
+
+    def _submit(self, input, config: Optional[RunnableConfig]) -> Optional[Future]:
+        # Checks the flag and queues under one lock, so a request is either
+        # queued before close() sends its sentinel or not batched at all
+        with self._lock:
+            if self._closed:
+                return None
+            if self._collector is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                                    thread_name_prefix="routing-batch")
+                self._collector = threading.Thread(target=self._collect, name="routing-batcher", daemon=True)
+                self._collector.start()
+            self.requests += 1
+            future = Future()
+            self._queue.put((input, config, future))
+        return future
+
+    def submit(self, input, config: Optional[RunnableConfig] = None) -> Future:
+        """Queues one routing request; the returned future holds the chain's output."""
+        future = self._submit(input, config)
+        if future is None:
+            raise RuntimeError("The routing batcher is closed.")
+        return future
+
+    def invoke(self, input, config: Optional[RunnableConfig] = None):
+        future = self._submit(input, config)
+        if future is None:
+            # A graph that was dropped while a run was still using it
+            return self.chain.invoke(input, config)
+        return future.result()
+
+    async def ainvoke(self, input, config: Optional[RunnableConfig] = None):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._closed:
+                future = None
+            else:
+                requests = self._loops.get(loop)
+                if requests is None:
+                    requests = self._loops[loop] = asyncio.Queue()
+                    task = loop.create_task(self._acollect(requests, asyncio.Semaphore(self.max_concurrency)))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+                self.requests += 1
+                future = loop.create_future()
+                requests.put_nowait((input, config, future))
+        if future is None:
+            return await self.chain.ainvoke(input, config)
+        return await future
+
+    def _batch_configs(self, batch) -> list:
+        return [{**(item[1] or {}), "max_concurrency": len(batch)} for item in batch]
+
+    @staticmethod
+    def _settle(batch, results) -> None:
+        for (_, _, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    @staticmethod
+    def _fail(batch, error: BaseException) -> None:
+        logger.error(f"Routing batch of {len(batch)} failed: {error}", exc_info=True)
+        for _, _, future in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    def _collect(self):
+        while (item := self._queue.get()) is not None:
+            batch = [item]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch_size and time.monotonic() < deadline:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    # Closed: send what was collected, then stop
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+            # Wait for room before dispatching; requests keep queueing meanwhile
+            for _ in batch:
+                self._slots.acquire()
+            with self._lock:
+                self.batches += 1
+            self._executor.submit(self._dispatch, batch)
+
+    def _dispatch(self, batch):
+        try:
+            inputs = [item[0] for item in batch]
+            self._settle(batch, self.chain.batch(inputs, self._batch_configs(batch), return_exceptions=True))
+        except BaseException as e:
+            self._fail(batch, e)
+        finally:
+            for _ in batch:
+                self._slots.release()
+
+    async def _acollect(self, requests: asyncio.Queue, slots: asyncio.Semaphore):
+        batch = []
+        try:
+            closing = False
+            while not closing:
+                if (item := await requests.get()) is None:
+                    break
+                batch = [item]
+                deadline = time.monotonic() + self.window
+                while len(batch) < self.max_batch_size and time.monotonic() < deadline:
+                    if requests.empty():
+                        # Let tasks that are ready to run queue their requests first
+                        await asyncio.sleep(0)
+                        if requests.empty():
+                            break
+                    if (item := requests.get_nowait()) is None:
+                        # Closed: send what was collected, then stop
+                        closing = True
+                        break
+                    batch.append(item)
+                for _ in batch:
+                    await slots.acquire()
+                with self._lock:
+                    self.batches += 1
+                task = asyncio.ensure_future(self._adispatch(batch, slots))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+                batch = []
+        except asyncio.CancelledError:
+            # The event loop is shutting down: fail what was collected or
+            # queued, so no caller waits forever
+            error = RuntimeError("The routing batcher was stopped before the request was sent.")
+            while not requests.empty():
+                if (item := requests.get_nowait()) is not None:
+                    batch.append(item)
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            raise
+
+    async def _adispatch(self, batch, slots: asyncio.Semaphore):
+        try:
+            inputs = [item[0] for item in batch]
+            self._settle(batch, await self.chain.abatch(inputs, self._batch_configs(batch), return_exceptions=True))
+        except asyncio.CancelledError:
+            # The event loop is shutting down
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(RuntimeError("The routing batcher was stopped before the request was sent."))
+            raise
+        except BaseException as e:
+            self._fail(batch, e)
+        finally:
+            for _ in batch:
+                slots.release()
+
+    def close(self) -> None:
+        """
+        Stops the collector thread, its executor and the async collectors.
+
+        Requests already queued are still sent; later calls go straight to
+        the chain without batching. Requests of an event loop that shuts
+        down before they are sent fail with a RuntimeError.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            collector, executor = self._collector, self._executor
+            loops = list(self._loops.items())
+        if collector is not None:
+            self._queue.put(None)
+            collector.join()
+            executor.shutdown(wait=False)
+        for loop, requests in loops:
+            try:
+                loop.call_soon_threadsafe(requests.put_nowait, None)
+            except RuntimeError:
+                # The loop is closed, and its collector with it
+                pass
+
+    def stats(self) -> dict:
+        """Returns the number of requests and batches, and the average batch size."""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "batches": self.batches,
+                "avg_batch_size": self.requests / self.batches if self.batches else 0.0,
+            }
@@ -1,5 +1,4 @@
 from langchain_openai import ChatOpenAI
-from langchain_core.tools import tool
 from langgraph.prebuilt import create_react_agent
 
 
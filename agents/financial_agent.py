@@ -1,7 +1,5 @@
 from langchain_openai import ChatOpenAI
 from langgraph.prebuilt import create_react_agent
-from tools.alpha_vantage import alpha_vantage_tool
-from tools.date import get_current_date
 
 def create_financial_agent(llm: ChatOpenAI, tools, system_prompt: str = None):
     """
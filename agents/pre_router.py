@@ -0,0 +1,188 @@
+"""
+Deterministic pre-routing for the supervisor.
+
+A `PreRouter` runs in front of the supervisor's structured-output LLM call.
+Each configured rule looks at the conversation and either returns a route
+(an agent name or "FINISH") when it is confident, or `None` to defer. The
+first confident rule wins; if none is, the supervisor falls back to the LLM.
+
+Rules are configured under `supervisor.pre_router` in `agent_config.json`:
+
+    "pre_router": {
+        "enabled": true,
+        "rules": [
+            {"type": "finish", "after": ["CodeAgent"], "patterns": ["(?i)saved as"]},
+            {"type": "keyword",
+             "agents": {"WebSearchAgent": ["(?i)\\bnews\\b"]},
+             "signals": {"FinancialAgent": ["(?i)\\bprices?\\b"]}}
+        ]
+    }
+
+Additional rule types (for example a small local classifier) can be plugged
+in with `register_rule_type`.
+"""
+import re
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+from langchain_core.messages import HumanMessage
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def message_text(content) -> str:
+    """Returns the text of a message's content, joining the text parts of list content."""
+    if isinstance(content, str):
+        return content
+    parts = []
+    for part in content or []:
+        if isinstance(part, str):
+            parts.append(part)
+        elif isinstance(part, dict) and part.get("type") == "text":
+            parts.append(part.get("text", ""))
+    return "\n".join(parts)
+
+class KeywordRule:
+    """
+    Routes the user's request by matching regular expressions per agent.
+
+    Only applies on the first hop (the last message is from the user). The
+    rule is confident only if exactly one agent's `agents` patterns match
+    and the request has no signal for any other agent: neither one of that
+    agent's `agents` patterns nor one of its `signals`, weaker hints that a
+    part of the request needs it (e.g. a ticker symbol). Multi-part requests
+    are left to the LLM.
+    """
+
+    def __init__(self, members: List[str], agents: Dict[str, List[str]],
+                 signals: Optional[Dict[str, List[str]]] = None):
+        self.patterns = {
+            agent: [re.compile(pattern) for pattern in patterns]
+            for agent, patterns in agents.items()
+            if agent in members
+        }
+        self.signals = {
+            agent: [re.compile(pattern) for pattern in patterns]
+            for agent, patterns in (signals or {}).items()
+            if agent in members
+        }
+
+    def __call__(self, messages, available: List[str]) -> Optional[str]:
+        if not messages or not isinstance(messages[-1], HumanMessage):
+            return None
+        text = message_text(messages[-1].content)
+        matched = [
+            agent for agent, patterns in self.patterns.items()
+            if any(p.search(text) for p in patterns)
+        ]
+        if len(matched) != 1 or matched[0] not in available:
+            return None
+        if any(
+            agent != matched[0] and any(p.search(text) for p in patterns)
+            for agent, patterns in self.signals.items()
+        ):
+            return None
+        return matched[0]
+
+class FinishRule:
+    """
+    Finishes the run when the last message comes from one of the `after`
+    agents and matches one of `patterns` (any content matches if no patterns
+    are given).
+    """
+
+    def __init__(self, members: List[str], after: List[str], patterns: Optional[List[str]] = None):
+        self.after = set(after)
+        self.patterns = [re.compile(pattern) for pattern in patterns or []]
+
+    def __call__(self, messages, available: List[str]) -> Optional[str]:
+        if not messages or getattr(messages[-1], "name", None) not in self.after:
+            return None
+        text = message_text(messages[-1].content)
+        if not self.patterns or any(p.search(text) for p in self.patterns):
+            return "FINISH"
+        return None
+
+# Map rule type names used in agent_config.json to rule factories
+RULE_TYPES: Dict[str, Callable] = {
+    "keyword": KeywordRule,
+    "finish": FinishRule,
+}
+
+def register_rule_type(name: str, factory: Callable) -> None:
+    """
+    Registers a custom rule type.
+
+    Args:
+        name (str): The value of "type" that selects this rule in the config.
+        factory (Callable): Called as `factory(members, **options)` and must
+                            return a callable `rule(messages, available)` that
+                            returns an agent name, "FINISH" or None.
+    """
+    RULE_TYPES[name] = factory
+
+class PreRouter:
+    """
+    Evaluates the configured rules in order and keeps hit-rate statistics.
+    """
+
+    def __init__(self, rules: List[tuple]):
+        self.rules = rules
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._hits = {name: 0 for name, _ in rules}
+
+    @classmethod
+    def from_config(cls, config: Optional[dict], members: List[str]) -> Optional["PreRouter"]:
+        """
+        Builds a PreRouter from the `supervisor.pre_router` config section.
+
+        Returns:
+            PreRouter | None: None if the section is missing or disabled.
+        """
+        if not config or not config.get("enabled", True):
+            return None
+        rules = []
+        for index, rule_config in enumerate(config.get("rules", [])):
+            options = dict(rule_config)
+            rule_type = options.pop("type")
+            if rule_type not in RULE_TYPES:
+                raise ValueError(f"Unknown pre-router rule type: {rule_type}")
+            rules.append((f"{index}:{rule_type}", RULE_TYPES[rule_type](members, **options)))
+        return cls(rules)
+
+    def route(self, state, available: List[str]) -> Optional[str]:
+        """
+        Returns a route if a rule is confident, otherwise None.
+
+        Routes to agents that are no longer available are ignored, so the
+        turn limit enforced by the supervisor still holds.
+        """
+        messages = state["messages"]
+        decision = None
+        for name, rule in self.rules:
+            decision = rule(messages, available)
+            if decision == "FINISH" or decision in available:
+                break
+            decision = None
+        with self._lock:
+            self._calls += 1
+            if decision is not None:
+                self._hits[name] += 1
+        if decision is not None:
+            logger.debug(f"Pre-router rule {name} routed to {decision}")
+        return decision
+
+    def stats(self) -> dict:
+        """
+        Returns the number of routing decisions seen, how many were decided
+        without the LLM, the resulting hit rate, and the hits per rule.
+        """
+        with self._lock:
+            hits = sum(self._hits.values())
+            return {
+                "calls": self._calls,
+                "hits": hits,
+                "hit_rate": hits / self._calls if self._calls else 0.0,
+                "rules": dict(self._hits),
+            }
@@ -1,71 +1,181 @@
+import functools
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import RunnableLambda
+from langgraph.constants import TAG_NOSTREAM
+from agents.batching import RoutingBatcher
+from graph.state import TurnCounter
 from pydantic import BaseModel, Field, create_model
 from typing import Literal, Dict, List
 
-def create_route_response_model(members: List[str]):
+def create_route_response_model(members: List[str], allow_parallel: bool = False):
     """
     Dynamically creates the RouteResponse model with a Literal type 
     for the 'next' field, based on the provided list of members.
+
+    When `allow_parallel` is set, the model also gets a 'parallel' field that
+    lets the supervisor dispatch additional, independent agents in the same
+    step as 'next'.
+
+    Models are cached per member list, since building them with pydantic is
+    one of the more expensive parts of creating a supervisor.
     """
+    return _create_route_response_model(tuple(members), allow_parallel)
+
+@functools.lru_cache(maxsize=64)
+def _create_route_response_model(members: tuple, allow_parallel: bool):
     # Add "FINISH" to the list of possible next steps
-    possible_next_steps = Literal[tuple(["FINISH"] + members)]
+    possible_next_steps = Literal[("FINISH",) + members]
     
-    RouteResponse = create_model(
-        'RouteResponse',
-        next=(possible_next_steps, Field(
+    fields = {
+        "next": (possible_next_steps, Field(
             ..., 
             description="The next agent to act or 'FINISH' to end the conversation."
         )),
+    }
+    if allow_parallel:
+        fields["parallel"] = (List[Literal[members]], Field(
+            default_factory=list,
+            description="Other agents that can work on independent parts of the request "
+                        "at the same time as 'next'. Leave empty if they need each other's output."
+        ))
+
+    RouteResponse = create_model(
+        'RouteResponse',
+        **fields,
         __base__=BaseModel,
         __doc__="The supervisor's response to the user's request."
     )
     
     return RouteResponse
 
-def create_supervisor_agent(llm: ChatOpenAI, members: dict, supervisor_prompt_text: str, max_turns: int = 3):
+def create_supervisor_agent(llm: ChatOpenAI, members: dict, supervisor_prompt_text: str, max_turns: int = 3,
+                            allow_parallel: bool = False, pre_router=None, turn_counter=None,
+                            context_window=None, batching: dict = None):
     """
     Creates the supervisor agent.
+
+    Besides 'next', the supervisor writes 'next_agents': every agent to run in
+    the following step. It holds more than one agent only when `allow_parallel`
+    is set and the model fans the request out to independent agents.
+
+    If a `pre_router` (see `agents.pre_router.PreRouter`) is given, it is
+    consulted first and the LLM call is skipped whenever it is confident.
+    `turn_counter` (see `graph.state.TurnCounter`) reads the compact
+    agent_turn_counts; by default it indexes agents in `members` order.
+    A `context_window` (see `graph.context.ContextWindow`) trims the history
+    included in the routing prompt to a token budget.
+    With a `batching` config (see `agents.batching.RoutingBatcher`), routing
+    calls from concurrent conversations are batched, rate limited and retried.
+
+    The returned runnable routes synchronously on `invoke` and asynchronously
+    on `ainvoke`, so it can be used as a graph node in either mode.
     """
+    if turn_counter is None:
+        turn_counter = TurnCounter(members.keys())
+
     # Create the RouteResponse model dynamically
-    RouteResponse = create_route_response_model(list(members.keys()))
+    RouteResponse = create_route_response_model(list(members.keys()), allow_parallel)
     
     # Use the provided prompt text and concatenate agent descriptions
     agent_descriptions = "\n".join([f"- {name}: {description}" for name, description in members.items()])
     full_prompt = f"{supervisor_prompt_text} Available agents and their descriptions: {agent_descriptions}"
     
+    routing_instruction = "Based on the conversation, who should act next? Choose one of: {options}"
+    if allow_parallel:
+        routing_instruction += (
+            " If other agents can handle independent parts of the request at the same time,"
+            " list them in 'parallel' so they run concurrently."
+        )
+
     # Supervisor Prompt
     supervisor_prompt = ChatPromptTemplate.from_messages(
         [
             ("system", full_prompt),
             MessagesPlaceholder(variable_name="messages"),
-            (
-                "system",
-                "Based on the conversation, who should act next? Choose one of: {options}",
-            ),
+            ("system", routing_instruction),
         ]
     ).partial(options=str(["FINISH"] + list(members.keys())))
 
-    # Supervisor Agent Function
-    supervisor_chain = supervisor_prompt | llm.with_structured_output(RouteResponse)
+    # Supervisor Agent Function. Its structured output is not streamed as
+    # tokens; the routing decision is reported through the node's update.
+    def make_chain(model):
+        return (supervisor_prompt | model.with_structured_output(RouteResponse)).with_config(
+            tags=[TAG_NOSTREAM]
+        )
+    supervisor_chain = make_chain(llm)
+    batcher = RoutingBatcher.from_config(batching, llm, make_chain)
     
-    # Wrap the supervisor chain to filter out agents that have exceeded max_turns
-    def supervisor_with_turn_limit(state):
+    def available_agents(state):
         # Get agent turn counts from state
-        agent_turn_counts = state.get("agent_turn_counts", {})
-        
+        agent_turn_counts = state.get("agent_turn_counts")
+
         # Filter out agents that have exceeded max_turns
-        available_agents = [
-            agent for agent in members.keys() 
-            if agent_turn_counts.get(agent, 0) < max_turns
+        return [
+            agent for agent in members.keys()
+            if turn_counter.get(agent_turn_counts, agent) < max_turns
         ]
-        
+
+    def route(result, available):
+        # An agent that has used up its turns cannot run again, so choosing it
+        # ends the run, as agent_node would
+        if result.next != "FINISH" and result.next not in available:
+            return {"next": "FINISH", "next_agents": []}
+
+        # Fan out to the extra agents that are still under their turn limit
+        next_agents = [] if result.next == "FINISH" else [result.next]
+        for agent in getattr(result, "parallel", []):
+            if agent in available and agent not in next_agents:
+                next_agents.append(agent)
+        return {"next": result.next, "next_agents": next_agents}
+
+    def pre_route(state, available):
+        # Decide without the LLM when a deterministic rule is confident
+        if pre_router is None:
+            return None
+        decision = pre_router.route(state, available)
+        if decision is None:
+            return None
+        return {"next": decision, "next_agents": [] if decision == "FINISH" else [decision]}
+
+    # Wrap the supervisor chain to filter out agents that have exceeded max_turns
+    def supervisor_with_turn_limit(state, config):
+        available = available_agents(state)
         # If no agents are available, force FINISH
-        if not available_agents:
-            return {"next": "FINISH"}
+        if not available:
+            return {"next": "FINISH", "next_agents": []}
+
+        # Skip the LLM call if the pre-router already knows the route
+        if (decision := pre_route(state, available)) is not None:
+            return decision
         
         # If agents are available, use the supervisor chain
-        result = supervisor_chain.invoke(state)
-        return {"next": result.next}
-    
-    return supervisor_with_turn_limit
+        if context_window is not None:
+            state = {**state, "messages": context_window.apply(state["messages"])}
+        if batcher is not None:
+            result = batcher.invoke(state, config)
+        else:
+            result = supervisor_chain.invoke(state)
+        return route(result, available)
+
+    # Async variant used when the graph is driven with `astream`/`ainvoke`
+    async def asupervisor_with_turn_limit(state, config):
+        available = available_agents(state)
+        if not available:
+            return {"next": "FINISH", "next_agents": []}
+
+        if (decision := pre_route(state, available)) is not None:
+            return decision
+
+        if context_window is not None:
+            state = {**state, "messages": await context_window.aapply(state["messages"])}
+        if batcher is not None:
+            result = await batcher.ainvoke(state, config)
+        else:
+            result = await supervisor_chain.ainvoke(state)
+        return route(result, available)
+
+    supervisor = RunnableLambda(supervisor_with_turn_limit, afunc=asupervisor_with_turn_limit)
+    # Expose the batcher so callers can report its batch sizes
+    supervisor.batcher = batcher
+    return supervisor
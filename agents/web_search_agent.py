@@ -1,7 +1,5 @@
 from langchain_openai import ChatOpenAI
-from langchain_community.tools.tavily_search import TavilySearchResults
 from langgraph.prebuilt import create_react_agent
-from tools.date import get_current_date
 
 def create_web_search_agent(llm: ChatOpenAI, tools, system_prompt: str = None):
     """
@@ -0,0 +1,160 @@
+"""
+Batch runner for the multi-agent graph.
+
+Streams prompts from a JSONL file, runs each one through the graph on its own
+thread with bounded concurrency, and writes one JSONL result per prompt with
+its answer, the nodes it went through and its timings. A throughput summary
+is printed at the end, which makes this the tool for replaying production
+traffic and measuring the effect of changes.
+
+Usage:
+    uv run python batch.py prompts.jsonl -o results.jsonl --concurrency 16
+"""
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+from langchain_openai import ChatOpenAI
+from langchain_core.messages import HumanMessage
+from graph.builder import build_graph
+from graph.instrumentation import Instrumentation
+from graph.answer_cache import acached_answer, aremember_answer
+from tools.transport import llm_http_clients
+from dotenv import load_dotenv
+
+# Load environment variables
+_ = load_dotenv()
+
+def read_prompts(path: str, prompt_field: str, id_field: str):
+    """Yields (record_id, prompt) pairs from a JSONL file, one line at a time."""
+    with open(path, "r") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            yield str(record.get(id_field, line_number)), record[prompt_field]
+
+async def run_prompt(graph, record_id: str, prompt: str, run_id: str, thread_id: str = None) -> dict:
+    """
+    Runs one prompt through the graph on its own thread, or on `thread_id`
+    to continue that conversation.
+
+    Returns:
+        dict: The result record: id, thread id, final answer, the nodes that
+              produced updates, time to first update, total time, error and
+              whether the answer came from the answer cache.
+    """
+    thread_id = thread_id or f"{run_id}-{record_id}"
+    config = {"configurable": {"thread_id": thread_id}}
+    route, answer, error = [], None, None
+    first_update_s = None
+    cached = False
+    start = time.perf_counter()
+    try:
+        if (hit := await acached_answer(graph, prompt, config)) is not None:
+            answer, cached = hit["answer"], True
+            first_update_s = time.perf_counter() - start
+        else:
+            async for event in graph.astream({"messages": [HumanMessage(content=prompt)]}, config=config):
+                if first_update_s is None:
+                    first_update_s = time.perf_counter() - start
+                for node, value in event.items():
+                    route.append(node)
+                    if value and value.get("messages"):
+                        answer = value["messages"][-1].content
+            await aremember_answer(graph, prompt, config)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return {
+        "id": record_id,
+        "thread_id": thread_id,
+        "answer": answer,
+        "route": route,
+        "first_update_s": first_update_s,
+        "elapsed_s": time.perf_counter() - start,
+        "error": error,
+        "cached": cached,
+    }
+
+def percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+async def run_batch(graph, input_path: str, output_path: str, concurrency: int,
+                    prompt_field: str = "prompt", id_field: str = "id") -> dict:
+    """
+    Runs every prompt of `input_path` through `graph` and writes the results.
+
+    Prompts are read lazily and handed to `concurrency` workers through a
+    bounded queue, so memory stays flat however large the input file is.
+
+    Returns:
+        dict: Summary with request count, errors, wall time, throughput and
+              latency percentiles.
+    """
+    run_id = uuid.uuid4().hex[:8]
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    latencies, errors = [], 0
+    start = time.perf_counter()
+
+    with open(output_path, "w") as out:
+        async def worker():
+            nonlocal errors
+            while (item := await queue.get()) is not None:
+                result = await run_prompt(graph, *item, run_id)
+                latencies.append(result["elapsed_s"])
+                errors += result["error"] is not None
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        for item in read_prompts(input_path, prompt_field, id_field):
+            await queue.put(item)
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+
+    wall_s = time.perf_counter() - start
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "wall_s": wall_s,
+        "throughput_rps": len(latencies) / wall_s if wall_s else 0.0,
+        "p50_s": percentile(latencies, 0.50),
+        "p95_s": percentile(latencies, 0.95),
+        "max_s": max(latencies, default=0.0),
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run prompts from a JSONL file through the multi-agent graph.")
+    parser.add_argument("input", help="JSONL file with one prompt per line.")
+    parser.add_argument("-o", "--output", default="results.jsonl", help="Where to write the JSONL results.")
+    parser.add_argument("-c", "--concurrency", type=int, default=8, help="Prompts processed at the same time.")
+    parser.add_argument("--prompt-field", default="prompt", help="Field holding the prompt text.")
+    parser.add_argument("--id-field", default="id", help="Field holding the record id (defaults to the line number).")
+    parser.add_argument("--config", default="agent_config.json", help="Agent configuration file.")
+    parser.add_argument("--model", default="gpt-4o", help="OpenAI model used by all agents.")
+    parser.add_argument("--metrics", help="Write per-node, LLM, tool and cache metrics to this file "
+                                          "(JSON for a .json file, otherwise Prometheus text format).")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    llm = ChatOpenAI(model=args.model, temperature=0, **llm_http_clients())
+    with open(args.config, "r") as f:
+        config_json = json.load(f)
+    instrumentation = Instrumentation() if args.metrics else None
+    graph = build_graph(llm, config_json, instrumentation=instrumentation)
+    summary = asyncio.run(run_batch(
+        graph, args.input, args.output, args.concurrency, args.prompt_field, args.id_field
+    ))
+    print(json.dumps(summary, indent=2), file=sys.stderr)
+    if instrumentation is not None:
+        instrumentation.export(args.metrics)
+
+if __name__ == "__main__":
+    main()
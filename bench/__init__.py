@@ -0,0 +1,5 @@
+"""
+Benchmark package for the multi-agent system.
+This package contains an offline harness that measures graph overhead
+with a scripted chat model and stub tools, without any network calls.
+"""
@@ -0,0 +1,137 @@
+"""
+Deterministic stand-in for `ChatOpenAI` used by the benchmarks.
+
+`ScriptedChatModel` supports everything the graph needs from a chat model:
+`bind_tools` for the ReAct agents, `with_structured_output` for the
+supervisor, and plain calls for summarization. Its behaviour is scripted:
+
+- As the supervisor, it routes to the configured agents in round-robin order
+  until `hops` agent answers are in the conversation, then answers FINISH.
+- As an agent with tools, it calls its first tool once and then answers.
+- Every call sleeps for `latency` seconds to model network time (set it to 0
+  to measure pure graph overhead) and reports approximate token usage.
+- When streamed, answers are emitted word by word after the same latency,
+  which is then the time to first token.
+"""
+import json
+import time
+import asyncio
+from typing import Any, AsyncIterator, Iterator, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Scripted chat model with configurable latency.
+
+    Args:
+        hops (int): Number of agent answers after which the supervisor finishes.
+        latency (float): Seconds each model call sleeps.
+        answer_chars (int): Length of the agents' final answers.
+    """
+
+    hops: int = 3
+    latency: float = 0.0
+    answer_chars: int = 400
+    bound_tools: List[dict] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        # Remember each tool's name and argument names so calls can be scripted
+        specs = []
+        for tool in tools:
+            function = convert_to_openai_tool(tool)["function"]
+            specs.append({
+                "name": function["name"],
+                "args": list(function.get("parameters", {}).get("properties", {}).keys()),
+            })
+        return self.model_copy(update={"bound_tools": specs})
+
+    def with_structured_output(self, schema, **kwargs):
+        members = [m for m in schema.model_fields["next"].annotation.__args__ if m != "FINISH"]
+
+        def route(prompt_value):
+            messages = prompt_value.to_messages()
+            answered = sum(1 for m in messages if isinstance(m, AIMessage) and m.name in members)
+            if answered >= self.hops:
+                return schema(next="FINISH")
+            return schema(next=members[answered % len(members)])
+
+        def sync_route(prompt_value):
+            time.sleep(self.latency)
+            return route(prompt_value)
+
+        async def async_route(prompt_value):
+            await asyncio.sleep(self.latency)
+            return route(prompt_value)
+
+        return RunnableLambda(sync_route, afunc=async_route)
+
+    def _respond(self, messages: List[BaseMessage]) -> ChatResult:
+        if self.bound_tools and not isinstance(messages[-1], ToolMessage):
+            tool = self.bound_tools[0]
+            message = AIMessage(
+                content="",
+                tool_calls=[{
+                    "name": tool["name"],
+                    "args": {arg: "BENCH" for arg in tool["args"]},
+                    "id": f"call_{len(messages)}",
+                }],
+            )
+        else:
+            message = AIMessage(content=("benchmark answer " * self.answer_chars)[:self.answer_chars])
+        input_tokens = sum(len(str(m.content)) for m in messages) // 4
+        output_tokens = len(str(message.content)) // 4 + 1
+        message.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency)
+        return self._respond(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._respond(messages)
+
+    def _chunks(self, messages: List[BaseMessage]) -> List[ChatGenerationChunk]:
+        message = self._respond(messages).generations[0].message
+        if message.tool_calls:
+            words = [""]
+        else:
+            words = [word + " " for word in message.content.split(" ")]
+        chunks = [ChatGenerationChunk(message=AIMessageChunk(content=word)) for word in words]
+        first, last = chunks[0].message, chunks[-1].message
+        first.tool_call_chunks = [
+            {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": i}
+            for i, call in enumerate(message.tool_calls)
+        ]
+        last.usage_metadata = message.usage_metadata
+        return chunks
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency)
+        for chunk in self._chunks(messages):
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.message.content, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency)
+        for chunk in self._chunks(messages):
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.message.content, chunk=chunk)
+            yield chunk
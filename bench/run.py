@@ -0,0 +1,177 @@
+"""
+Offline benchmark for the multi-agent graph.
+
+Builds the real graph from `agent_config.json` with `ScriptedChatModel` in
+place of `ChatOpenAI` and stub tools in place of `TOOL_REGISTRY`, then runs
+a number of conversations for every combination of agent count and
+conversation length. For each combination it reports:
+
+- steps per second (graph node executions per wall-clock second),
+- p50/p99 latency per node,
+- Python memory growth per conversation (tracemalloc, measured in a
+  separate pass), which includes the state kept by the checkpointer.
+
+Usage:
+    uv run python -m bench.run --agents 1 3 --turns 1 3 6 --conversations 50
+    uv run python -m bench.run --llm-latency 0.05 --async --json bench.json
+"""
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime
+from langchain_core.messages import HumanMessage
+from bench.fake_llm import ScriptedChatModel
+from bench.stubs import stub_tools
+from graph.builder import build_graph
+
+def subset_config(config: dict, agent_count: int, checkpointer: str) -> dict:
+    """Returns a copy of `config` restricted to its first `agent_count` agents."""
+    config = json.loads(json.dumps(config))
+    keep = list(config["agents"].keys())[:agent_count]
+    config["agents"] = {name: config["agents"][name] for name in keep}
+    config["relations"] = [r for r in config["relations"] if r["sender"] in keep or r["receiver"] in keep]
+    for edge in config["conditional_edges"]:
+        edge["receivers"] = {k: v for k, v in edge["receivers"].items() if k in keep}
+    if checkpointer == "memory":
+        config["checkpointer"] = {"backend": "memory"}
+    return config
+
+def percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def _collect(debug_event, started: dict, durations: dict) -> int:
+    # Pair "task" and "task_result" debug events to time each node execution
+    payload = debug_event["payload"]
+    timestamp = datetime.fromisoformat(debug_event["timestamp"])
+    if debug_event["type"] == "task":
+        started[payload["id"]] = timestamp
+    elif debug_event["type"] == "task_result" and payload["id"] in started:
+        durations[payload["name"]].append((timestamp - started.pop(payload["id"])).total_seconds())
+        return 1
+    return 0
+
+def run_conversations(graph, count: int, durations: dict) -> int:
+    steps = 0
+    run_id = uuid.uuid4().hex[:8]
+    for i in range(count):
+        started = {}
+        config = {"configurable": {"thread_id": f"bench-{run_id}-{i}"}}
+        for event in graph.stream({"messages": [HumanMessage(content=f"benchmark request {i}")]},
+                                  config=config, stream_mode="debug"):
+            steps += _collect(event, started, durations)
+    return steps
+
+async def arun_conversations(graph, count: int, durations: dict, concurrency: int) -> int:
+    semaphore = asyncio.Semaphore(concurrency)
+    run_id = uuid.uuid4().hex[:8]
+
+    async def one(i):
+        steps = 0
+        started = {}
+        config = {"configurable": {"thread_id": f"bench-{run_id}-{i}"}}
+        async with semaphore:
+            async for event in graph.astream({"messages": [HumanMessage(content=f"benchmark request {i}")]},
+                                             config=config, stream_mode="debug"):
+                steps += _collect(event, started, durations)
+        return steps
+
+    return sum(await asyncio.gather(*(one(i) for i in range(count))))
+
+def benchmark(config: dict, agent_count: int, turns: int, args) -> dict:
+    """Runs one benchmark combination and returns its measurements."""
+    llm = ScriptedChatModel(hops=turns, latency=args.llm_latency)
+    graph = build_graph(llm, subset_config(config, agent_count, args.checkpointer))
+    try:
+        durations = defaultdict(list)
+
+        # Warm up once so imports and lazy initialization are not measured
+        run_conversations(graph, 1, defaultdict(list))
+
+        def run(durations):
+            if args.use_async:
+                return asyncio.run(arun_conversations(graph, args.conversations, durations, args.concurrency))
+            return run_conversations(graph, args.conversations, durations)
+
+        # Timing pass
+        start = time.perf_counter()
+        steps = run(durations)
+        wall_s = time.perf_counter() - start
+
+        # Separate memory pass, since tracing allocations slows everything down
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        run(defaultdict(list))
+        after, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return {
+            "agents": agent_count,
+            "turns": turns,
+            "conversations": args.conversations,
+            "steps": steps,
+            "wall_s": wall_s,
+            "steps_per_s": steps / wall_s if wall_s else 0.0,
+            "memory_growth_kb_per_conversation": (after - before) / 1024 / args.conversations,
+            "peak_memory_kb": peak / 1024,
+            "nodes": {
+                name: {
+                    "count": len(values),
+                    "p50_ms": percentile(values, 0.50) * 1000,
+                    "p99_ms": percentile(values, 0.99) * 1000,
+                }
+                for name, values in sorted(durations.items())
+            },
+        }
+    finally:
+        # Stop the routing batcher's and prefetcher's threads before the next combination
+        graph.close()
+
+def print_result(result: dict) -> None:
+    print(f"agents={result['agents']} turns={result['turns']} conversations={result['conversations']}: "
+          f"{result['steps']} steps in {result['wall_s']:.2f}s ({result['steps_per_s']:.1f} steps/s), "
+          f"memory +{result['memory_growth_kb_per_conversation']:.1f} KB/conversation")
+    for name, stats in result["nodes"].items():
+        print(f"    {name:<16} n={stats['count']:<5} p50={stats['p50_ms']:8.2f} ms  p99={stats['p99_ms']:8.2f} ms")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the multi-agent graph offline.")
+    parser.add_argument("--config", default="agent_config.json", help="Agent configuration file.")
+    parser.add_argument("--agents", type=int, nargs="+", default=[1, 3], help="Agent counts to benchmark.")
+    parser.add_argument("--turns", type=int, nargs="+", default=[1, 3, 6],
+                        help="Conversation lengths, in agent answers before the supervisor finishes.")
+    parser.add_argument("--conversations", type=int, default=20, help="Conversations per combination.")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds each model call takes.")
+    parser.add_argument("--tool-latency", type=float, default=0.0, help="Seconds each tool call takes.")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="Run conversations with astream.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent conversations in --async mode.")
+    parser.add_argument("--checkpointer", choices=["memory", "config"], default="memory",
+                        help="Use an in-memory checkpointer, or the one configured in the config file.")
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    with open(args.config, "r") as f:
+        config = json.load(f)
+
+    results = []
+    with stub_tools(args.tool_latency):
+        for agent_count in args.agents:
+            for turns in args.turns:
+                result = benchmark(config, agent_count, turns, args)
+                print_result(result)
+                results.append(result)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
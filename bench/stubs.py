@@ -0,0 +1,77 @@
+"""
+Local stand-ins for the tools in `TOOL_REGISTRY`.
+
+Each stub has the same name and arguments as the real tool, sleeps for a
+configurable latency and returns a deterministic payload of realistic size,
+so message sizes, and therefore serialization and context costs, match
+real runs.
+"""
+import json
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from langchain_core.tools import tool
+from tools.timeseries import summarize
+from tools.tool_registry import TOOL_REGISTRY
+
+def _daily_series(ticker: str, days: int = 100) -> dict:
+    start = date(2024, 1, 1)
+    series = {}
+    for i in range(days):
+        price = 100 + (i % 17) * 1.5
+        series[(start + timedelta(days=i)).isoformat()] = {
+            "1. open": f"{price:.4f}",
+            "2. high": f"{price + 2:.4f}",
+            "3. low": f"{price - 2:.4f}",
+            "4. close": f"{price + 0.5:.4f}",
+            "5. volume": str(1_000_000 + i * 1000),
+        }
+    return {"Meta Data": {"2. Symbol": ticker}, "Time Series (Daily)": series}
+
+def create_stub_tools(latency: float = 0.0) -> dict:
+    """Returns stub tools keyed by their `TOOL_REGISTRY` names."""
+
+    def alpha_vantage(ticker: str) -> str:
+        """Daily prices for a stock ticker."""
+        time.sleep(latency)
+        return summarize(_daily_series(ticker))
+
+    def get_current_date() -> str:
+        """Returns the current date."""
+        time.sleep(latency)
+        return "The current date is: 01 January 2024"
+
+    def tavily_search(query: str) -> str:
+        """Searches the web."""
+        time.sleep(latency)
+        return json.dumps([{"title": f"Result {i}", "content": "lorem ipsum " * 40} for i in range(5)])
+
+    def python_repl(query: str) -> str:
+        """Executes Python code."""
+        time.sleep(latency)
+        return ""
+
+    def execute_and_save_graph_tool(code: str, stock_name: str) -> str:
+        """Saves a graph as a JPEG."""
+        time.sleep(latency)
+        return f"Graph saved as {stock_name}.jpeg"
+
+    return {
+        "alpha_vantage": tool(alpha_vantage),
+        "get_current_date": tool(get_current_date),
+        "tavily_search": tool(tavily_search),
+        "python_repl": tool("Python_REPL")(python_repl),
+        "execute_and_save_graph_tool": tool(execute_and_save_graph_tool),
+    }
+
+@contextmanager
+def stub_tools(latency: float = 0.0):
+    """Swaps every `TOOL_REGISTRY` entry for its stub, restoring them on exit."""
+    # Copy without building the real tools
+    original = TOOL_REGISTRY.copy()
+    TOOL_REGISTRY.update(create_stub_tools(latency))
+    try:
+        yield
+    finally:
+        TOOL_REGISTRY.clear()
+        TOOL_REGISTRY.update(original)
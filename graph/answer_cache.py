@@ -0,0 +1,263 @@
+"""
+Semantic cache of whole-graph answers.
+
+Near-duplicate requests ("latest news about Tesla stock", "Latest Tesla
+stock news?") are answered from memory instead of running the supervisor and
+agents again. Each request is normalized and embedded locally with hashed
+word and character n-gram features, so no embedding model or service is
+needed; filler words are ignored and whole words weigh more than their
+character trigrams. A lookup first tries the exact normalized request, then
+the most similar cached request above a cosine similarity threshold.
+
+The embedding only measures word overlap: requests differing in a single
+content word, e.g. "bullish" and "bearish", can still score above 0.85. The
+default threshold is therefore strict (0.95), and numbers, ticker symbols
+and capitalized words (company names, places, people) must match exactly,
+so "Microsoft earnings" never answers "Amazon earnings" and "AAPL price"
+never answers "MSFT price". The cache is off by default in
+`agent_config.json`; enable it only where a near-duplicate's answer is
+acceptable.
+
+Entries expire per agent type: the TTL of an answer is the shortest TTL of
+the agents that produced it, e.g. minutes for web search, until the next
+market close for daily prices, and never cached for CodeAgent, which writes
+files. The cache holds at most `max_entries` answers and evicts the least
+recently used one. Every agent answer of the run is kept, so a cached
+multi-agent exchange is replayed in full.
+
+Only the first request of a conversation is served from or stored in the
+cache, since follow-ups depend on the conversation so far.
+"""
+import re
+import time
+import zlib
+import threading
+from typing import Dict, List, Optional, Tuple, Union
+import numpy as np
+from langchain_core.messages import AIMessage, HumanMessage
+from tools.market_hours import seconds_until_market_close
+
+EMBEDDING_DIM = 512
+
+# Words that do not change what is being asked
+STOPWORDS = frozenset(
+    "a an the of on in at to for about is are was be me my show tell give please and or with from by "
+    "what whats what's how latest current recent today now".split()
+)
+
+# Special TTL value for answers based on daily data
+MARKET_CLOSE = "market_close"
+
+def normalize(text: str) -> str:
+    """Lowercases, strips punctuation (keeping $ and decimal points) and collapses whitespace."""
+    text = re.sub(r"[^\w\s$.]", " ", text.lower())
+    return " ".join(word.strip(".") for word in text.split() if word.strip("."))
+
+def entities(text: str) -> frozenset:
+    """
+    Numbers, ticker-like symbols ($TSLA, AAPL) and capitalized words (Tesla,
+    Europe) that must match for a cache hit. Capitalized filler words, e.g. a
+    leading "What", are not entities.
+    """
+    numbers = re.findall(r"\d+(?:\.\d+)?", text)
+    tickers = [t.lstrip("$") for t in re.findall(r"\$?\b[A-Z]{2,5}\b", text)]
+    names = [word for word in re.findall(r"\b[A-Z][\w'.&-]*", text)
+             if word.lower().rstrip(".") not in STOPWORDS and word not in tickers]
+    return frozenset(numbers + tickers + names)
+
+def embed(text: str, dim: int = EMBEDDING_DIM, word_weight: float = 3.0) -> np.ndarray:
+    """Unit-length vector of hashed content words and their character trigrams."""
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in normalize(text).split():
+        if word in STOPWORDS:
+            continue
+        vector[zlib.crc32(word.encode("utf-8")) % dim] += word_weight
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            vector[zlib.crc32(padded[i:i + 3].encode("utf-8")) % dim] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+class AnswerCache:
+    """
+    Bounded cache of answers, searchable by request similarity.
+
+    Args:
+        similarity_threshold (float): Minimum cosine similarity for a hit.
+        max_entries (int): Maximum number of cached answers.
+        default_ttl_seconds (float): TTL for agents without their own.
+        ttl_seconds (dict): Per-agent TTL in seconds, or "market_close".
+                            A TTL of 0 disables caching of answers that
+                            agent contributed to.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.95, max_entries: int = 1000,
+                 default_ttl_seconds: float = 3600,
+                 ttl_seconds: Optional[Dict[str, Union[float, str]]] = None):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.default_ttl_seconds = default_ttl_seconds
+        self.ttl_seconds = ttl_seconds or {}
+        self._vectors = np.zeros((max_entries, EMBEDDING_DIM), dtype=np.float32)
+        self._entries: List[Optional[dict]] = [None] * max_entries
+        self._keys = {}
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+
+    @classmethod
+    def from_config(cls, config: Optional[dict]) -> Optional["AnswerCache"]:
+        """Creates the cache from the "answer_cache" config section, or returns None if disabled."""
+        if not config or not config.get("enabled", True):
+            return None
+        return cls(
+            similarity_threshold=config.get("similarity_threshold", 0.95),
+            max_entries=config.get("max_entries", 1000),
+            default_ttl_seconds=config.get("default_ttl_seconds", 3600),
+            ttl_seconds=config.get("ttl_seconds"),
+        )
+
+    def ttl_for(self, agents: List[str]) -> float:
+        """Returns the TTL of an answer produced by `agents`: the shortest of theirs."""
+        ttls = []
+        for agent in agents or [None]:
+            ttl = self.ttl_seconds.get(agent, self.default_ttl_seconds)
+            ttls.append(seconds_until_market_close() if ttl == MARKET_CLOSE else float(ttl))
+        return min(ttls)
+
+    def lookup(self, request: str) -> Optional[dict]:
+        """
+        Returns the cached answer for `request` or a near-duplicate of it.
+
+        Returns:
+            dict: "answers", the (agent, answer) pairs of the cached run in
+                  order, "answer" and "agent" of its final answer, and
+                  "similarity", or None on a miss.
+        """
+        key = normalize(request)
+        # Computed once, outside the lock
+        request_entities, vector = entities(request), embed(request)
+        now = time.time()
+        with self._lock:
+            self.lookups += 1
+            slot = self._keys.get(key)
+            similarity = 1.0
+            if slot is None:
+                live = [i for i, entry in enumerate(self._entries)
+                        if entry is not None and entry["expires_at"] > now
+                        and entry["entities"] == request_entities]
+                if not live:
+                    return None
+                scores = self._vectors[live] @ vector
+                best = int(np.argmax(scores))
+                slot, similarity = live[best], float(scores[best])
+                if similarity < self.similarity_threshold:
+                    return None
+            entry = self._entries[slot]
+            if entry["expires_at"] <= now:
+                return None
+            entry["last_used"] = now
+            self.hits += 1
+            agent, answer = entry["answers"][-1]
+            return {"answers": list(entry["answers"]), "answer": answer, "agent": agent,
+                    "similarity": similarity}
+
+    def store(self, request: str, answers: List[Tuple[str, str]]) -> None:
+        """
+        Caches the (agent, answer) pairs of a run for `request`, unless one of
+        the agents has a TTL of 0.
+        """
+        agents = list(dict.fromkeys(agent for agent, _ in answers))
+        if not answers or not answers[-1][1]:
+            return
+        ttl = self.ttl_for(agents)
+        if ttl <= 0:
+            return
+        key = normalize(request)
+        request_entities, vector = entities(request), embed(request)
+        now = time.time()
+        with self._lock:
+            slot = self._keys.get(key)
+            if slot is None:
+                slot = self._free_slot(now)
+            old = self._entries[slot]
+            if old is not None:
+                self._keys.pop(old["key"], None)
+            self._entries[slot] = {
+                "key": key,
+                "answers": list(answers),
+                "entities": request_entities,
+                "expires_at": now + ttl,
+                "last_used": now,
+            }
+            self._vectors[slot] = vector
+            self._keys[key] = slot
+
+    def _free_slot(self, now: float) -> int:
+        # Caller holds the lock. An empty or expired slot, else the least recently used one
+        for slot, entry in enumerate(self._entries):
+            if entry is None or entry["expires_at"] <= now:
+                return slot
+        return min(range(self.max_entries), key=lambda slot: self._entries[slot]["last_used"])
+
+    def stats(self) -> dict:
+        """Returns the number of lookups, hits, the hit rate and the number of entries."""
+        with self._lock:
+            return {
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+                "entries": sum(entry is not None for entry in self._entries),
+            }
+
+def _run_answers(messages) -> list:
+    # Every agent answer of the run that followed the only human message
+    humans = [m for m in messages if isinstance(m, HumanMessage)]
+    if len(humans) != 1:
+        return []
+    return [(m.name, m.content) for m in messages if isinstance(m, AIMessage) and m.name]
+
+def _cached_update(request: str, hit: dict) -> dict:
+    return {
+        "messages": [HumanMessage(content=request)] + [
+            AIMessage(content=answer, name=agent) for agent, answer in hit["answers"]
+        ],
+        "next": "FINISH",
+    }
+
+def cached_answer(graph, request: str, config: dict) -> Optional[dict]:
+    """
+    Looks up `request` in the graph's answer cache if it starts a conversation.
+
+    On a hit the cached exchange is written to the thread, so the
+    conversation can be continued as if the graph had answered.
+    """
+    cache = getattr(graph, "answer_cache", None)
+    if cache is None or graph.get_state(config).values.get("messages"):
+        return None
+    hit = cache.lookup(request)
+    if hit is not None:
+        graph.update_state(config, _cached_update(request, hit), as_node=graph.supervisor_name)
+    return hit
+
+async def acached_answer(graph, request: str, config: dict) -> Optional[dict]:
+    """Async variant of `cached_answer`."""
+    cache = getattr(graph, "answer_cache", None)
+    if cache is None or (await graph.aget_state(config)).values.get("messages"):
+        return None
+    hit = cache.lookup(request)
+    if hit is not None:
+        await graph.aupdate_state(config, _cached_update(request, hit), as_node=graph.supervisor_name)
+    return hit
+
+def remember_answer(graph, request: str, config: dict) -> None:
+    """Stores the graph's answer to `request` if it was the first of its conversation."""
+    cache = getattr(graph, "answer_cache", None)
+    if cache is not None:
+        cache.store(request, _run_answers(graph.get_state(config).values.get("messages", [])))
+
+async def aremember_answer(graph, request: str, config: dict) -> None:
+    """Async variant of `remember_answer`."""
+    cache = getattr(graph, "answer_cache", None)
+    if cache is not None:
+        cache.store(request, _run_answers((await graph.aget_state(config)).values.get("messages", [])))
@@ -3,24 +3,35 @@ This module provides functions to dynamically build a multi-agent graph
 using LangGraph based on a provided configuration file.
 
 The main components are:
-- `agent_node`: A function that wraps an agent's execution, managing its turn count
-  to prevent infinite loops.
+- `agent_node` / `aagent_node`: Sync and async wrappers around an agent's
+  execution, managing its turn count to prevent infinite loops.
+- `LazyAgent`: Defers creating an agent, and its tools, until it is first
+  invoked, so agents the supervisor never routes to cost nothing.
 - `build_graph`: The core function that constructs the entire agentic graph,
   including agents, a supervisor, and the connections between them, as defined
-  in a configuration dictionary.
+  in a configuration dictionary. Every node supports both `graph.stream` and
+  `graph.astream`, so the same compiled graph can be driven from a thread or
+  from an asyncio event loop.
 """
 import json
+import threading
 import functools
 from langgraph.graph import StateGraph, START, END
-from langgraph.checkpoint.memory import MemorySaver
-from graph.state import AgentState
+from graph.checkpoint import create_checkpointer
+from graph.state import AgentState, TurnCounter
 from agents.supervisor import create_supervisor_agent
+from agents.pre_router import PreRouter
+from graph.context import ContextWindow
+from graph.answer_cache import AnswerCache
+from graph.prefetch import Prefetcher
 from agents.agent_list import agent_creators
 from tools.tool_registry import TOOL_REGISTRY
 from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
 from langchain_openai import ChatOpenAI
 
-def agent_node(state: AgentState, agent, name: str, max_turns: int) -> dict:
+def agent_node(state: AgentState, agent, name: str, max_turns: int, turn_counter: TurnCounter,
+               context_window=None, prefetcher=None, config=None) -> dict:
     """
     A node in the graph that executes a specific agent.
 
@@ -36,38 +47,136 @@ def agent_node(state: AgentState, agent, name: str, max_turns: int) -> dict:
         name (str): The name of the agent being executed.
         max_turns (int): The maximum number of times this agent is allowed to
                          be called in a single graph execution.
+        turn_counter (TurnCounter): Maps agent names to their slot in the
+                         state's agent_turn_counts.
+        context_window (ContextWindow): Optional token budget applied to the
+                         messages sent to the agent.
+        prefetcher (Prefetcher): Optional source of tool calls started
+                         speculatively for this request, handed to the agent
+                         as calls it has already made.
+        config (RunnableConfig): The run config, which identifies the thread.
 
     Returns:
         dict: A dictionary containing the agent's output message, the next
-              node to transition to (usually the Supervisor), and the updated
-              turn counts.
+              node to transition to (usually the Supervisor), and the turn
+              count delta for this agent, which the state reducer adds up.
     """
-    # Ensure agent_turn_counts is a mutable copy from the state
-    agent_turn_counts = dict(state.get("agent_turn_counts", {}))
-
-    # Increment the turn count for the current agent
-    agent_turn_counts[name] = agent_turn_counts.get(name, 0) + 1
-
-    # Check if the agent has exceeded its maximum number of turns
-    if agent_turn_counts[name] > max_turns:
-        # If so, force a finish by routing to the special "FINISH" end node
-        return {
-            "messages": state["messages"],
-            "next": "FINISH",
-            "agent_turn_counts": agent_turn_counts
-        }
-
-    # Invoke the agent with the current state's messages
-    result = agent.invoke({"messages": state["messages"]})
+    # Check if the agent has already used up its turns
+    if turn_counter.get(state.get("agent_turn_counts"), name) >= max_turns:
+        # If so, force a finish by routing to the special "FINISH" end node.
+        # Nothing is added to the message history.
+        return {"next": "FINISH"}
+
+    # Invoke the agent with the current state's messages, trimmed to its token budget
+    messages = context_window.apply(state["messages"]) if context_window else state["messages"]
+    if prefetcher is not None:
+        messages = list(messages) + prefetcher.messages_for(config, name)
+    result = agent.invoke({"messages": messages})
     
     # Return the result, routing back to the supervisor for the next decision
     return {
         "messages": [AIMessage(content=result["messages"][-1].content, name=name)],
         "next": "Supervisor",
-        "agent_turn_counts": agent_turn_counts
+        "agent_turn_counts": turn_counter.increment(name)
     }
 
-def build_graph(llm: ChatOpenAI, config: dict) -> StateGraph:
+async def aagent_node(state: AgentState, agent, name: str, max_turns: int, turn_counter: TurnCounter,
+                      context_window=None, prefetcher=None, config=None) -> dict:
+    """
+    Async counterpart of `agent_node`.
+
+    Awaits `agent.ainvoke` instead of blocking on `agent.invoke`, so that many
+    conversations can wait on the LLM and tool calls concurrently on a single
+    event loop. Turn counting and the returned update are identical to
+    `agent_node`.
+    """
+    if turn_counter.get(state.get("agent_turn_counts"), name) >= max_turns:
+        return {"next": "FINISH"}
+
+    messages = await context_window.aapply(state["messages"]) if context_window else state["messages"]
+    if prefetcher is not None:
+        messages = list(messages) + await prefetcher.amessages_for(config, name)
+    result = await agent.ainvoke({"messages": messages})
+
+    return {
+        "messages": [AIMessage(content=result["messages"][-1].content, name=name)],
+        "next": "Supervisor",
+        "agent_turn_counts": turn_counter.increment(name)
+    }
+
+class LazyAgent:
+    """
+    Creates an agent on its first invocation.
+
+    Building a ReAct agent compiles its graph and builds its tools, which
+    import their client libraries. Deferring that to the first call keeps
+    startup fast and keeps unused agents out of memory.
+
+    Args:
+        creator (Callable): The agent creator from `agent_creators`.
+        llm (ChatOpenAI): The language model passed to the creator.
+        tool_names (list): Names of the agent's tools in `TOOL_REGISTRY`.
+        system_prompt (str): Optional system prompt passed to the creator.
+    """
+
+    def __init__(self, creator, llm, tool_names, system_prompt=None):
+        self._creator = creator
+        self._llm = llm
+        self._tool_names = tool_names
+        self._system_prompt = system_prompt
+        self._agent = None
+        self._lock = threading.Lock()
+
+    @property
+    def agent(self):
+        """The underlying agent, created on first access."""
+        if self._agent is None:
+            with self._lock:
+                if self._agent is None:
+                    # Assemble the tools for this agent from the central tool registry
+                    tools = [TOOL_REGISTRY[t] for t in self._tool_names if t in TOOL_REGISTRY]
+                    self._agent = self._creator(self._llm, tools, self._system_prompt)
+        return self._agent
+
+    def invoke(self, *args, **kwargs):
+        return self.agent.invoke(*args, **kwargs)
+
+    async def ainvoke(self, *args, **kwargs):
+        return await self.agent.ainvoke(*args, **kwargs)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.agent, name)
+
+def _seed_turn_counts(input_state):
+    """Resets agent_turn_counts for a new input; an empty tuple clears the reducer."""
+    if isinstance(input_state, dict) and "agent_turn_counts" not in input_state:
+        input_state["agent_turn_counts"] = ()
+    return input_state
+
+def create_agent(name: str, agent_config: dict, llm: ChatOpenAI):
+    """
+    Creates the (lazy) agent for one entry of the config's "agents" section.
+
+    Returns:
+        LazyAgent: The agent, or None if there is no creator for `name`.
+    """
+    creator = agent_creators.get(name)
+    if creator is None:
+        return None
+    return LazyAgent(creator, llm, agent_config.get("tools", []), agent_config.get("prompt"))
+
+def _node(name: str, func, afunc, instrumentation=None, profiler=None) -> RunnableLambda:
+    """Creates a graph node from sync and async functions, timing it if instrumented or profiled."""
+    if profiler is not None:
+        func, afunc = profiler.wrap_node(name, func, afunc)
+    if instrumentation is not None:
+        func, afunc = instrumentation.wrap_node(name, func, afunc)
+    return RunnableLambda(func, afunc=afunc, name=name)
+
+def build_graph(llm: ChatOpenAI, config: dict, checkpointer=None, instrumentation=None,
+                agents: dict = None, profiler=None) -> StateGraph:
     """
     Builds and compiles the multi-agent graph from a configuration dictionary.
 
@@ -77,38 +186,73 @@ def build_graph(llm: ChatOpenAI, config: dict) -> StateGraph:
     2. Create a supervisor agent responsible for routing tasks.
     3. Construct a `StateGraph` and add all agents and the supervisor as nodes.
     4. Define the edges (transitions) between nodes as specified in the config.
-    5. Set up conditional routing based on the supervisor's decisions.
-    6. Compile the graph, enabling memory for state persistence.
+    5. Set up conditional routing based on the supervisor's decisions. When
+       `supervisor.parallel` is enabled, the supervisor may dispatch several
+       independent agents in one step; their edges back to the supervisor
+       join the branches, and the state reducers merge their messages and
+       turn counts. A configured pre-router can decide obvious routes
+       without calling the LLM, and a configured prefetcher starts
+       predictable tool calls while the supervisor is still routing.
+       Each agent and the supervisor only see the history that fits their
+       configured `context` token budget.
+    6. Compile the graph with the checkpointer selected by the `checkpointer`
+       config section (in-memory by default, or a bounded SQLite store).
 
     Args:
         llm (ChatOpenAI): The language model instance to be used by all agents.
         config (dict): A dictionary containing the entire graph configuration,
                        including agent definitions, supervisor settings, and
                        relationships (edges).
+        checkpointer: Optional checkpointer to use instead of the one
+                      configured in `config`, e.g. to share one store
+                      between several graphs.
+        instrumentation (Instrumentation): Optional collector that records
+                      per-node wall time, LLM token usage, tool calls and
+                      cache hits for every run of the graph.
+        agents (dict): Optional agents to reuse, by name, e.g. from an
+                      earlier graph built from the same agent config (see
+                      `graph.factory.GraphFactory`). Missing agents are
+                      created with `create_agent`.
+        profiler (GraphProfiler): Optional CPU profiler for the first runs
+                      of the graph, attributing time to each node (see
+                      `graph.profiling`).
 
     Returns:
         StateGraph: The compiled, executable LangGraph instance.
     """
-    agents = {}
     agent_nodes = {}
 
     # Get max_turns from config, with a default value if not specified
     max_turns = config.get("max_turns", 3)
+    # Default token budget for agent and supervisor context, overridable per agent
+    default_context = config.get("context")
+    # Fixed slot per configured agent for the compact turn counts
+    turn_counter = TurnCounter(config["agents"].keys())
+    # Optional speculative tool calls, started while the supervisor routes
+    prefetcher = Prefetcher.from_config(config.get("prefetch"), config["agents"])
     
-    # Create each agent and its corresponding graph node from the config
+    # Create each agent's graph node from the config; the agent itself is
+    # only built when the supervisor first routes to it
     for name, agent_config in config["agents"].items():
-        creator = agent_creators.get(name)
-        if creator:
-            # Assemble the tools for this agent from the central tool registry
-            tool_names = agent_config.get("tools", [])
-            tools = [TOOL_REGISTRY[t] for t in tool_names if t in TOOL_REGISTRY]
-            system_prompt = agent_config.get("prompt")
-
-            # Create the agent instance
-            agent = creator(llm, tools, system_prompt)
-            agents[name] = agent
-            # Create a partial function for the agent node to fix its arguments
-            agent_nodes[name] = functools.partial(agent_node, agent=agent, name=name, max_turns=max_turns)
+        agent = (agents or {}).get(name) or create_agent(name, agent_config, llm)
+        if agent:
+            context_window = ContextWindow.from_config(default_context, agent_config.get("context"), llm)
+            # Bind the agent to both the sync and async node functions so the
+            # graph can be run with either `stream` or `astream`
+            agent_nodes[name] = _node(
+                name,
+                functools.partial(agent_node, agent=agent, name=name, max_turns=max_turns,
+                                  turn_counter=turn_counter, context_window=context_window,
+                                  prefetcher=prefetcher),
+                functools.partial(aagent_node, agent=agent, name=name, max_turns=max_turns,
+                                  turn_counter=turn_counter, context_window=context_window,
+                                  prefetcher=prefetcher),
+                instrumentation,
+                profiler,
+            )
+
+    # Create the optional deterministic pre-router that can skip the supervisor's LLM call
+    pre_router = PreRouter.from_config(config["supervisor"].get("pre_router"), list(config["agents"].keys()))
 
     # Create the supervisor agent
     supervisor_name = config["supervisor"]["name"]
@@ -118,7 +262,12 @@ def build_graph(llm: ChatOpenAI, config: dict) -> StateGraph:
         # Provide the supervisor with descriptions of all agents it can route to
         {name: agent_config["description"] for name, agent_config in config["agents"].items()},
         supervisor_prompt_text,
-        max_turns
+        max_turns,
+        allow_parallel=config["supervisor"].get("parallel", False),
+        pre_router=pre_router,
+        turn_counter=turn_counter,
+        context_window=ContextWindow.from_config(default_context, config["supervisor"].get("context"), llm),
+        batching=config["supervisor"].get("batching")
     )
     
     # Initialize the graph with the defined state structure
@@ -127,7 +276,10 @@ def build_graph(llm: ChatOpenAI, config: dict) -> StateGraph:
     # Add all agent nodes and the supervisor node to the graph
     for name, node in agent_nodes.items():
         workflow.add_node(name, node)
-    workflow.add_node(supervisor_name, supervisor_agent)
+    supervisor_func, supervisor_afunc = supervisor_agent.func, supervisor_agent.afunc
+    if prefetcher is not None:
+        supervisor_func, supervisor_afunc = prefetcher.wrap_supervisor(supervisor_func, supervisor_afunc)
+    workflow.add_node(supervisor_name, _node(supervisor_name, supervisor_func, supervisor_afunc, instrumentation, profiler))
 
     # Define direct edges (unconditional transitions) between nodes
     for relation in config["relations"]:
@@ -142,8 +294,12 @@ def build_graph(llm: ChatOpenAI, config: dict) -> StateGraph:
         conditional_map = {name: name for name in receivers.keys()}
         conditional_map["FINISH"] = END  # Map "FINISH" to the graph's end
         
-        # The routing function simply returns the 'next' value from the state
+        # The routing function returns the 'next' value from the state, or the
+        # whole list of agents when the supervisor fanned out to several of them
         def route_next(state, conditional_map=conditional_map):
+            next_agents = [a for a in state.get("next_agents") or [] if a in conditional_map]
+            if state["next"] != "FINISH" and len(next_agents) > 1:
+                return next_agents
             return state["next"]
             
         workflow.add_conditional_edges(sender, route_next, conditional_map)
@@ -151,17 +307,50 @@ def build_graph(llm: ChatOpenAI, config: dict) -> StateGraph:
     # Define the entry point of the graph
     workflow.add_edge(START, supervisor_name)
 
-    # Compile the graph, enabling memory for persisting state across runs
-    memory = MemorySaver()
-    graph = workflow.compile(checkpointer=memory)
+    # Compile the graph, enabling the checkpointer for persisting state across runs
+    if checkpointer is None:
+        checkpointer = create_checkpointer(config.get("checkpointer"))
+    graph = workflow.compile(checkpointer=checkpointer)
 
-    # Patch the graph's stream method to initialize agent_turn_counts in the input state
+    # Patch the graph's stream methods to initialize agent_turn_counts in the input state
     # This ensures the turn counting mechanism works correctly from the start.
+    # `invoke` and `ainvoke` are implemented on top of these, so they are covered too.
+    # When instrumented, the callback handler that records LLM and tool calls is
+    # attached to every run here as well, and when profiled, the run is
+    # profiled while its events are consumed.
+    def prepare_config(config):
+        return instrumentation.attach(config) if instrumentation is not None else config
+
     orig_stream = graph.stream
-    def stream_with_turn_counts(input_state, *args, **kwargs):
-        if "agent_turn_counts" not in input_state:
-            input_state["agent_turn_counts"] = {}
-        return orig_stream(input_state, *args, **kwargs)
+    def stream_with_turn_counts(input_state, config=None, **kwargs):
+        events = orig_stream(_seed_turn_counts(input_state), prepare_config(config), **kwargs)
+        return profiler.profile_run(events) if profiler is not None else events
     graph.stream = stream_with_turn_counts
 
+    orig_astream = graph.astream
+    def astream_with_turn_counts(input_state, config=None, **kwargs):
+        events = orig_astream(_seed_turn_counts(input_state), prepare_config(config), **kwargs)
+        return profiler.aprofile_run(events) if profiler is not None else events
+    graph.astream = astream_with_turn_counts
+
+    # Expose the pre-router, routing batcher, prefetcher and instrumentation so callers can report on them
+    graph.pre_router = pre_router
+    graph.prefetcher = prefetcher
+    graph.routing_batcher = supervisor_agent.batcher
+    graph.instrumentation = instrumentation
+    graph.profiler = profiler
+    # The optional answer cache is consulted by callers before running the graph
+    # (see graph.answer_cache.cached_answer); cached exchanges are recorded as
+    # supervisor updates
+    graph.answer_cache = AnswerCache.from_config(config.get("answer_cache"))
+    graph.supervisor_name = supervisor_name
+
+    def close():
+        """Stops the threads of the routing batcher and prefetcher; the graph still runs without them."""
+        if graph.routing_batcher is not None:
+            graph.routing_batcher.close()
+        if graph.prefetcher is not None:
+            graph.prefetcher.close()
+    graph.close = close
+
     return graph
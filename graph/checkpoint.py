@@ -0,0 +1,464 @@
+"""
+Checkpointer backends for the multi-agent graph.
+
+`build_graph` compiles the graph with the backend selected by the
+`checkpointer` section of `agent_config.json`:
+
+    "checkpointer": {"backend": "memory"}
+
+or
+
+    "checkpointer": {
+        "backend": "sqlite",
+        "path": "checkpoints.sqlite",
+        "batch_size": 16,
+        "flush_interval_seconds": 2.0,
+        "max_checkpoints_per_thread": 10,
+        "idle_ttl_seconds": 604800
+    }
+
+The SQLite backend survives restarts, keeps only the last N checkpoints of
+each thread and evicts threads that have been idle for longer than the TTL,
+so storage stays bounded however long the process runs.
+"""
+import time
+import atexit
+import asyncio
+import sqlite3
+import logging
+import threading
+from typing import Any, AsyncIterator, Iterator, Optional, Sequence
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+)
+from langgraph.checkpoint.memory import MemorySaver
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE INDEX IF NOT EXISTS checkpoints_updated_at ON checkpoints (thread_id, updated_at);
+"""
+
+class SqliteCheckpointSaver(BaseCheckpointSaver):
+    """
+    Checkpointer that stores checkpoints in a local SQLite file.
+
+    Writes are buffered and committed in batches: the buffer is flushed when
+    it holds `batch_size` operations, before every read, on `close()` (also
+    registered to run at interpreter exit) and at the latest
+    `flush_interval_seconds` after its first operation, by a timer, so a
+    crash loses at most that much of the conversation.
+
+    Args:
+        path (str): Path of the SQLite database file.
+        batch_size (int): Number of buffered operations that triggers a flush.
+        flush_interval_seconds (float): Maximum age of buffered operations.
+        max_checkpoints_per_thread (int): Root checkpoints kept per thread;
+                                          anything older is pruned.
+        idle_ttl_seconds (float): Threads without a new checkpoint for this
+                                  long are deleted. None disables eviction.
+    """
+
+    def __init__(
+        self,
+        path: str = "checkpoints.sqlite",
+        batch_size: int = 16,
+        flush_interval_seconds: float = 2.0,
+        max_checkpoints_per_thread: int = 10,
+        idle_ttl_seconds: Optional[float] = 7 * 24 * 3600,
+        *,
+        serde=None,
+    ):
+        super().__init__(serde=serde)
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_checkpoints_per_thread = max_checkpoints_per_thread
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._lock = threading.RLock()
+        self._pending = []
+        self._touched = set()
+        self._last_flush = time.monotonic()
+        self._last_eviction = 0.0
+        self._timer = None
+        self._closed = False
+        atexit.register(self.close)
+
+    # --- buffering -------------------------------------------------------
+
+    def _enqueue(self, sql: str, params: Sequence[tuple], thread_id: str) -> None:
+        with self._lock:
+            self._pending.append((sql, params))
+            self._touched.add(thread_id)
+            if (len(self._pending) >= self.batch_size
+                    or time.monotonic() - self._last_flush >= self.flush_interval_seconds):
+                self.flush()
+            elif self._timer is None:
+                # Commit the buffer in time even if no further write or read comes
+                self._timer = threading.Timer(self.flush_interval_seconds, self._flush_due)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush_due(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            try:
+                self.flush()
+            except sqlite3.Error:
+                logger.exception(f"Failed to flush buffered checkpoints to {self.path}")
+
+    def flush(self) -> None:
+        """Commits all buffered writes, then applies retention and eviction."""
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, []
+            touched, self._touched = self._touched, set()
+            with self._conn:
+                for sql, params in pending:
+                    self._conn.executemany(sql, params)
+                for thread_id in touched:
+                    self._prune(thread_id)
+                self._evict_idle()
+
+    def _prune(self, thread_id: str) -> None:
+        # Keep the most recent root checkpoints of the thread (ids are time-ordered).
+        # Older checkpoints in every namespace, including those of agent subgraphs,
+        # are deleted together with their writes.
+        cutoff = self._conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = '' "
+            "ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?",
+            (thread_id, self.max_checkpoints_per_thread - 1),
+        ).fetchone()
+        if cutoff is None:
+            return
+        self._conn.execute(
+            "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_id < ?", (thread_id, cutoff[0])
+        )
+        self._conn.execute(
+            "DELETE FROM writes WHERE thread_id = ? AND checkpoint_id < ?", (thread_id, cutoff[0])
+        )
+
+    def _evict_idle(self) -> None:
+        # Checked at most once a minute, as part of a flush
+        now = time.time()
+        if self.idle_ttl_seconds is None or now - self._last_eviction < 60:
+            return
+        self._last_eviction = now
+        idle = self._conn.execute(
+            "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING MAX(updated_at) < ?",
+            (now - self.idle_ttl_seconds,),
+        ).fetchall()
+        if idle:
+            logger.info(f"Evicting {len(idle)} idle threads from {self.path}")
+            self._conn.executemany("DELETE FROM checkpoints WHERE thread_id = ?", idle)
+            self._conn.executemany("DELETE FROM writes WHERE thread_id = ?", idle)
+
+    def configure(
+        self,
+        batch_size: int = 16,
+        flush_interval_seconds: float = 2.0,
+        max_checkpoints_per_thread: int = 10,
+        idle_ttl_seconds: Optional[float] = 7 * 24 * 3600,
+        **_,
+    ) -> None:
+        """
+        Applies new batching and retention settings to the open saver, as if
+        it had been created with them. Other options, e.g. the path, are ignored.
+        """
+        with self._lock:
+            self.batch_size = batch_size
+            self.flush_interval_seconds = flush_interval_seconds
+            self.max_checkpoints_per_thread = max_checkpoints_per_thread
+            self.idle_ttl_seconds = idle_ttl_seconds
+
+    def close(self) -> None:
+        """Flushes buffered writes and closes the database."""
+        with self._lock:
+            if self._closed:
+                return
+            self.flush()
+            self._conn.close()
+            self._closed = True
+
+    # --- reads -----------------------------------------------------------
+
+    def _load_tuple(self, row) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, checkpoint, metadata_type, metadata = row
+        writes = self._conn.execute(
+            "SELECT task_id, channel, type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint=self.serde.loads_typed((type_, checkpoint)),
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_id,
+                    }
+                }
+                if parent_id
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((value_type, value)))
+                for task_id, channel, value_type, value in writes
+            ],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Returns the requested checkpoint, or the latest one of the thread."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+            "metadata_type, metadata FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+        )
+        params = [thread_id, checkpoint_ns]
+        if checkpoint_id := get_checkpoint_id(config):
+            query += " AND checkpoint_id = ?"
+            params.append(checkpoint_id)
+        else:
+            query += " ORDER BY checkpoint_id DESC LIMIT 1"
+        with self._lock:
+            self.flush()
+            row = self._conn.execute(query, params).fetchone()
+            return self._load_tuple(row) if row else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        """Lists checkpoints, newest first, matching the given criteria."""
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+            "metadata_type, metadata FROM checkpoints"
+        )
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self._lock:
+            self.flush()
+            results = []
+            for row in self._conn.execute(query, params).fetchall():
+                checkpoint_tuple = self._load_tuple(row)
+                # Filter on metadata after deserializing it
+                if filter and not all(checkpoint_tuple.metadata.get(k) == v for k, v in filter.items()):
+                    continue
+                results.append(checkpoint_tuple)
+                if limit is not None and len(results) >= limit:
+                    break
+        yield from results
+
+    # --- writes ----------------------------------------------------------
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Buffers a checkpoint for the next batched commit."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        type_, serialized_checkpoint = self.serde.dumps_typed(checkpoint)
+        metadata_type, serialized_metadata = self.serde.dumps_typed(metadata)
+        self._enqueue(
+            "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+            "type, checkpoint, metadata_type, metadata, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(
+                thread_id,
+                checkpoint_ns,
+                checkpoint["id"],
+                config["configurable"].get("checkpoint_id"),
+                type_,
+                serialized_checkpoint,
+                metadata_type,
+                serialized_metadata,
+                time.time(),
+            )],
+            thread_id,
+        )
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Buffers the intermediate writes of a task."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        # Special writes (errors, interrupts) replace earlier ones; regular writes are kept once
+        verb = "INSERT OR REPLACE" if all(w[0] in WRITES_IDX_MAP for w in writes) else "INSERT OR IGNORE"
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            value_type, serialized_value = self.serde.dumps_typed(value)
+            rows.append((
+                thread_id,
+                checkpoint_ns,
+                checkpoint_id,
+                task_id,
+                WRITES_IDX_MAP.get(channel, idx),
+                channel,
+                value_type,
+                serialized_value,
+                task_path,
+            ))
+        self._enqueue(
+            f"{verb} INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value, "
+            "task_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+            thread_id,
+        )
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Deletes all checkpoints and writes of a thread."""
+        with self._lock:
+            self.flush()
+            with self._conn:
+                self._conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+                self._conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+
+    # --- async -----------------------------------------------------------
+    # SQLite calls run in the default executor so the event loop is never blocked.
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.get_running_loop().run_in_executor(None, self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        results = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for checkpoint_tuple in results:
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.put, config, checkpoint, metadata, new_versions
+        )
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.put_writes, config, writes, task_id, task_path
+        )
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        return await asyncio.get_running_loop().run_in_executor(None, self.delete_thread, thread_id)
+
+def create_checkpointer(config: Optional[dict]) -> BaseCheckpointSaver:
+    """
+    Creates the checkpointer selected by the `checkpointer` config section.
+
+    Args:
+        config (dict): The section, or None for the in-memory default.
+
+    Returns:
+        BaseCheckpointSaver: A MemorySaver or a SqliteCheckpointSaver.
+    """
+    options = dict(config or {})
+    backend = options.pop("backend", "memory")
+    if backend == "memory":
+        return MemorySaver()
+    if backend == "sqlite":
+        return SqliteCheckpointSaver(**options)
+    raise ValueError(f"Unknown checkpointer backend: {backend}")
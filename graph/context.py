@@ -0,0 +1,190 @@
+"""
+Token-budgeted message windowing for the graph.
+
+`AgentState.messages` only ever grows, but agents and the supervisor do not
+need the whole history on every hop. A `ContextWindow` trims the history that
+is sent to one agent (or the supervisor) to a token budget: it always keeps
+the original user request and the latest one, then as many of the most
+recent messages as fit. Optionally, the messages that were dropped are
+summarized by the LLM into a single compact message. Summaries are built
+incrementally: as more messages fall out of the window, the cached summary
+of the previously dropped ones is updated with only the newly dropped
+messages, so each message is sent to the summarizer once.
+
+Windows are configured in `agent_config.json`, either globally under
+`context` or per agent/supervisor (per-agent keys override the global ones):
+
+    "context": {"max_tokens": 6000, "summarize": false}
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Sequence
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langgraph.constants import TAG_NOSTREAM
+
+SUMMARY_PROMPT = (
+    "Summarize the following conversation between a user and a team of agents. "
+    "Keep every fact, number, ticker symbol and decision that later steps may need. "
+    "Be concise."
+)
+UPDATE_PROMPT = (
+    "Update the summary of a conversation between a user and a team of agents with the new messages "
+    "that follow it. Keep every fact, number, ticker symbol and decision that later steps may need. "
+    "Be concise. Reply with the updated summary only."
+)
+
+# Summaries are internal; keep their tokens out of stream_mode="messages"
+_SUMMARY_CONFIG = {"tags": [TAG_NOSTREAM]}
+
+def approximate_token_count(messages: Sequence[BaseMessage]) -> int:
+    """Cheap token estimate: roughly four characters per token plus per-message overhead."""
+    return sum(len(str(m.content)) // 4 + 4 for m in messages)
+
+class ContextWindow:
+    """
+    Trims a message history to a token budget.
+
+    Args:
+        max_tokens (int): Token budget for the messages passed to the model.
+        summarize (bool): Replace dropped messages with an LLM summary.
+        summary_max_tokens (int): Part of the budget reserved for the summary.
+        llm: The language model used for summarization and, when
+             `token_counter` is "model", for counting tokens.
+        token_counter (str): "approximate" (default, no model call) or "model".
+    """
+
+    def __init__(self, max_tokens: int, summarize: bool = False, summary_max_tokens: int = 300,
+                 llm=None, token_counter: str = "approximate"):
+        if summarize and llm is None:
+            raise ValueError("An llm is required to summarize dropped messages")
+        self.max_tokens = max_tokens
+        self.summarize = summarize
+        self.summary_max_tokens = summary_max_tokens
+        self.llm = llm
+        if token_counter == "model":
+            self.count_tokens = llm.get_num_tokens_from_messages
+        else:
+            self.count_tokens = approximate_token_count
+        self._summaries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, defaults: Optional[dict], overrides: Optional[dict], llm=None) -> Optional["ContextWindow"]:
+        """
+        Builds a window from the global `context` section and a per-agent
+        override. Returns None if no `max_tokens` budget is configured.
+        """
+        options = {**(defaults or {}), **(overrides or {})}
+        if not options.get("max_tokens"):
+            return None
+        return cls(llm=llm, **options)
+
+    def _split(self, messages: List[BaseMessage]):
+        """
+        Returns (head, dropped, recent): the original user request, the
+        messages that do not fit and the most recent messages that do. In a
+        thread with several requests, `recent` always starts with the latest
+        user request, even when some of the replies to it are dropped.
+        """
+        humans = [i for i, m in enumerate(messages) if isinstance(m, HumanMessage)]
+        lower = humans[0] + 1 if humans else 0
+        head = messages[:lower]
+        latest = humans[-1] if humans and humans[-1] >= lower else None
+        budget = self.max_tokens - self.count_tokens(head)
+        if latest is not None:
+            budget -= self.count_tokens([messages[latest]])
+        if self.summarize:
+            budget -= self.summary_max_tokens
+
+        # Walk backwards, keeping the most recent messages that fit the budget.
+        # The latest message is always kept, even if it alone exceeds it.
+        start = len(messages)
+        while start > lower:
+            if start - 1 == latest:
+                start -= 1
+                continue
+            cost = self.count_tokens([messages[start - 1]])
+            if cost > budget and start < len(messages):
+                break
+            budget -= cost
+            start -= 1
+        if latest is not None and start > latest:
+            dropped = messages[lower:latest] + messages[latest + 1:start]
+            return head, dropped, [messages[latest]] + messages[start:]
+        return head, messages[lower:start], messages[start:]
+
+    def _prefix_keys(self, dropped: List[BaseMessage]) -> List[str]:
+        # One key per prefix of the dropped messages, so a summary of an
+        # earlier, shorter prefix can be found and extended
+        digest = hashlib.sha256()
+        keys = []
+        for m in dropped:
+            digest.update(f"{m.type}:{getattr(m, 'name', '')}:{m.content}\n".encode())
+            keys.append(digest.hexdigest())
+        return keys
+
+    def _summary_request(self, previous: Optional[str], new: List[BaseMessage]) -> List[BaseMessage]:
+        transcript = "\n".join(f"{getattr(m, 'name', None) or m.type}: {m.content}" for m in new)
+        if previous is None:
+            return [SystemMessage(content=SUMMARY_PROMPT), HumanMessage(content=transcript)]
+        return [
+            SystemMessage(content=UPDATE_PROMPT),
+            HumanMessage(content=f"Summary so far: {previous}\n\nNew messages:\n{transcript}"),
+        ]
+
+    def _plan_summary(self, dropped: List[BaseMessage]):
+        """
+        Returns (key, summary, request): the cache key of `dropped` and either
+        its cached summary message, or the summarization request that extends
+        the longest cached prefix's summary with the remaining messages.
+        """
+        keys = self._prefix_keys(dropped)
+        with self._lock:
+            for covered in range(len(keys), 0, -1):
+                cached = self._summaries.get(keys[covered - 1])
+                if cached is not None:
+                    self._summaries.move_to_end(keys[covered - 1])
+                    break
+            else:
+                covered, cached = 0, None
+        if covered == len(dropped):
+            return keys[-1], cached[1], None
+        return keys[-1], None, self._summary_request(cached[0] if cached else None, dropped[covered:])
+
+    def _store_summary(self, key: str, content: str) -> BaseMessage:
+        summary = SystemMessage(content=f"Summary of the earlier conversation: {content}")
+        with self._lock:
+            self._summaries[key] = (content, summary)
+            # Keep the summary cache bounded
+            while len(self._summaries) > 128:
+                self._summaries.popitem(last=False)
+        return summary
+
+    def apply(self, messages: Sequence[BaseMessage]) -> List[BaseMessage]:
+        """Returns the messages to send, trimmed (and summarized) to the budget."""
+        messages = list(messages)
+        if self.count_tokens(messages) <= self.max_tokens:
+            return messages
+        head, dropped, recent = self._split(messages)
+        if not (self.summarize and dropped):
+            return head + recent
+        key, summary, request = self._plan_summary(dropped)
+        if summary is None:
+            response = self.llm.invoke(request, config=_SUMMARY_CONFIG)
+            summary = self._store_summary(key, response.content)
+        return head + [summary] + recent
+
+    async def aapply(self, messages: Sequence[BaseMessage]) -> List[BaseMessage]:
+        """Async variant of `apply`; awaits the summarization call."""
+        messages = list(messages)
+        if self.count_tokens(messages) <= self.max_tokens:
+            return messages
+        head, dropped, recent = self._split(messages)
+        if not (self.summarize and dropped):
+            return head + recent
+        key, summary, request = self._plan_summary(dropped)
+        if summary is None:
+            response = await self.llm.ainvoke(request, config=_SUMMARY_CONFIG)
+            summary = self._store_summary(key, response.content)
+        return head + [summary] + recent
@@ -0,0 +1,175 @@
+"""
+Cache of compiled graphs keyed by configuration content.
+
+`GraphFactory` hashes the normalized agent configuration together with the
+model settings and hands out the same compiled graph for the same key, so
+services that need a graph per tenant or per request only pay for building
+it once. Agents are cached separately, keyed by their own config entry, so a
+changed configuration only rebuilds the agents that actually changed.
+
+`GraphFactory.from_file` adds hot reload: the config file is re-read when its
+modification time changes, and the next call returns a graph built from the
+new content.
+"""
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from graph.builder import build_graph, create_agent
+from graph.checkpoint import create_checkpointer
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def config_hash(*parts) -> str:
+    """Returns a stable hash of JSON-serializable parts, independent of key order."""
+    normalized = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+def _llm_key(llm) -> str:
+    # Model name, temperature and the other settings that change the output
+    try:
+        return llm._get_llm_string()
+    except Exception:
+        return repr(llm)
+
+class GraphFactory:
+    """
+    Builds compiled graphs and reuses them and their agents from bounded LRU caches.
+
+    Args:
+        llm (ChatOpenAI): The language model used by every graph.
+        max_graphs (int): Number of compiled graphs kept.
+        max_agents (int): Number of agents kept.
+        instrumentation (Instrumentation): Optional collector passed to every graph.
+        profiler (GraphProfiler): Optional profiler passed to every graph.
+    """
+
+    def __init__(self, llm, max_graphs: int = 8, max_agents: int = 32, instrumentation=None, profiler=None):
+        self.llm = llm
+        self.max_graphs = max_graphs
+        self.max_agents = max_agents
+        self.instrumentation = instrumentation
+        self.profiler = profiler
+        self._llm_key = _llm_key(llm)
+        self._graphs = OrderedDict()
+        self._agents = OrderedDict()
+        # Checkpointers are shared by every graph with the same checkpointer
+        # config (or, for SQLite, the same file), so conversations survive a
+        # reload of the agent config
+        self._checkpointers = {}
+        self._files = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, config: dict):
+        """Returns the compiled graph for `config`, building it on a cache miss."""
+        key = config_hash(config, self._llm_key)
+        with self._lock:
+            graph = self._graphs.get(key)
+            if graph is not None:
+                self._graphs.move_to_end(key)
+                self.hits += 1
+                return graph
+
+            self.misses += 1
+            graph = build_graph(
+                self.llm,
+                config,
+                checkpointer=self._checkpointer(config.get("checkpointer")),
+                instrumentation=self.instrumentation,
+                agents=self._cached_agents(config),
+                profiler=self.profiler,
+            )
+            self._graphs[key] = graph
+            while len(self._graphs) > self.max_graphs:
+                self._graphs.popitem(last=False)[1].close()
+            return graph
+
+    def _drop(self, config: dict) -> None:
+        # Caller holds the lock. Runs still using the graph finish without its worker threads
+        graph = self._graphs.pop(config_hash(config, self._llm_key), None)
+        if graph is not None:
+            graph.close()
+
+    def from_file(self, path: str = "agent_config.json"):
+        """
+        Returns the graph for the config file at `path`.
+
+        The file is only read again when its modification time changes; the
+        graph built for the new content reuses every unchanged agent.
+        """
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            cached = self._files.get(path)
+            if cached is None or cached[0] != mtime:
+                with open(path, "r") as f:
+                    config = json.load(f)
+                if cached is not None:
+                    logger.info(f"{path} changed on disk, reloading the agent config")
+                    if config != cached[1]:
+                        self._drop(cached[1])
+                self._files[path] = (mtime, config)
+            else:
+                config = cached[1]
+            return self.get(config)
+
+    def _cached_agents(self, config: dict) -> dict:
+        # Caller holds the lock
+        agents = {}
+        for name, agent_config in config["agents"].items():
+            key = config_hash(name, agent_config.get("tools", []), agent_config.get("prompt"), self._llm_key)
+            agent = self._agents.get(key)
+            if agent is None:
+                agent = create_agent(name, agent_config, self.llm)
+                if agent is None:
+                    continue
+                logger.debug(f"Created agent {name}")
+                self._agents[key] = agent
+            self._agents.move_to_end(key)
+            agents[name] = agent
+        while len(self._agents) > self.max_agents:
+            self._agents.popitem(last=False)
+        return agents
+
+    def _checkpointer(self, checkpointer_config):
+        # Caller holds the lock. SQLite savers are keyed by their file: a
+        # second saver on the same file would hold its own unflushed writes,
+        # so a changed config updates the open saver's settings instead
+        options = dict(checkpointer_config or {})
+        if options.get("backend") == "sqlite":
+            key = ("sqlite", os.path.abspath(options.get("path", "checkpoints.sqlite")))
+            saver = self._checkpointers.get(key)
+            if saver is not None:
+                saver.configure(**options)
+                return saver
+        else:
+            key = config_hash(checkpointer_config)
+        if key not in self._checkpointers:
+            self._checkpointers[key] = create_checkpointer(checkpointer_config)
+        return self._checkpointers[key]
+
+    def close(self) -> None:
+        """Closes every cached graph and commits and closes the SQLite checkpointers."""
+        with self._lock:
+            while self._graphs:
+                self._graphs.popitem(last=False)[1].close()
+            for checkpointer in self._checkpointers.values():
+                close = getattr(checkpointer, "close", None)
+                if close is not None:
+                    close()
+            self._checkpointers.clear()
+            self._files.clear()
+
+    def stats(self) -> dict:
+        """Returns cache sizes and graph cache hit/miss counters."""
+        with self._lock:
+            return {
+                "graphs": len(self._graphs),
+                "agents": len(self._agents),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
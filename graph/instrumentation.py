@@ -0,0 +1,263 @@
+"""
+Per-node latency, token and tool-call instrumentation for the graph.
+
+An `Instrumentation` instance passed to `build_graph` records:
+
+- `node` events: wall time of every agent node and supervisor call,
+- `llm` events: wall time and token usage of every chat model call,
+- `tool` events: wall time and errors of every tool call, whichever
+  `TOOL_REGISTRY` tool it is,
+- `cache` events: hits and misses of the shared tool caches.
+
+Every event carries the `thread_id` of the conversation it belongs to. Events
+are kept in a bounded buffer, forwarded to listeners as they happen, and
+aggregated into an overall summary and a summary for each of the most
+recently active threads, which can be exported as JSON or as a Prometheus
+text file.
+"""
+import json
+import time
+import threading
+from collections import OrderedDict, defaultdict, deque
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler, BaseCallbackManager
+from langchain_core.runnables.utils import accepts_config
+from tools.cache import add_cache_listener
+
+# The instrumentation and thread id of the node currently running, so events
+# raised below it (e.g. cache hits inside a tool) are attributed correctly.
+_current: ContextVar[Optional[tuple]] = ContextVar("instrumentation_current", default=None)
+
+def _thread_id(config: Optional[dict]) -> Optional[str]:
+    return ((config or {}).get("configurable") or {}).get("thread_id")
+
+def _on_cache(cache_name: str, result: str) -> None:
+    # A single process-wide listener; the node running the lookup tells which
+    # instrumentation, if any, records it
+    current = _current.get()
+    if current is not None:
+        current[0].record("cache", cache_name, current[1], result=result)
+
+add_cache_listener(_on_cache)
+
+class _Stats:
+    """Aggregated counters for one thread (or for all threads)."""
+
+    def __init__(self):
+        self.nodes = defaultdict(lambda: {"calls": 0, "wall_s": 0.0})
+        self.tools = defaultdict(lambda: {"calls": 0, "errors": 0, "wall_s": 0.0})
+        self.llm = {"calls": 0, "wall_s": 0.0, "input_tokens": 0, "output_tokens": 0}
+        self.caches = defaultdict(lambda: {"hit": 0, "miss": 0, "coalesced": 0})
+
+    def add(self, event: dict) -> None:
+        kind = event["type"]
+        if kind == "node":
+            stats = self.nodes[event["name"]]
+            stats["calls"] += 1
+            stats["wall_s"] += event["wall_s"]
+        elif kind == "tool":
+            stats = self.tools[event["name"]]
+            stats["calls"] += 1
+            stats["errors"] += bool(event.get("error"))
+            stats["wall_s"] += event["wall_s"]
+        elif kind == "llm":
+            self.llm["calls"] += 1
+            self.llm["wall_s"] += event["wall_s"]
+            self.llm["input_tokens"] += event.get("input_tokens", 0)
+            self.llm["output_tokens"] += event.get("output_tokens", 0)
+        elif kind == "cache":
+            self.caches[event["name"]][event["result"]] += 1
+
+    def as_dict(self) -> dict:
+        return {
+            "nodes": {name: dict(stats) for name, stats in self.nodes.items()},
+            "tools": {name: dict(stats) for name, stats in self.tools.items()},
+            "llm": dict(self.llm),
+            "caches": {name: dict(stats) for name, stats in self.caches.items()},
+        }
+
+class Instrumentation:
+    """
+    Collects structured events and summaries for instrumented graphs.
+
+    Args:
+        max_events (int): Number of recent events kept in `events`.
+        max_threads (int): Number of threads with a summary of their own;
+                           the least recently active one is dropped first.
+    """
+
+    def __init__(self, max_events: int = 10000, max_threads: int = 1000):
+        self.events = deque(maxlen=max_events)
+        self.max_threads = max_threads
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._total = _Stats()
+        self._threads: Dict[Optional[str], _Stats] = OrderedDict()
+        self.callback_handler = InstrumentationCallbackHandler(self)
+
+    def add_listener(self, listener: Callable[[dict], None]) -> None:
+        """Registers a callable that receives every event as it is recorded."""
+        self._listeners.append(listener)
+
+    def record(self, kind: str, name: str, thread_id: Optional[str], **fields: Any) -> None:
+        """Records one event and updates the summaries."""
+        event = {"type": kind, "name": name, "thread_id": thread_id, "timestamp": time.time(), **fields}
+        with self._lock:
+            self.events.append(event)
+            self._total.add(event)
+            stats = self._threads.get(thread_id)
+            if stats is None:
+                stats = self._threads[thread_id] = _Stats()
+                while len(self._threads) > self.max_threads:
+                    self._threads.popitem(last=False)
+            else:
+                self._threads.move_to_end(thread_id)
+            stats.add(event)
+        for listener in self._listeners:
+            listener(event)
+
+    def wrap_node(self, name: str, func: Callable, afunc: Optional[Callable] = None):
+        """
+        Wraps a node's sync and async functions to time every call.
+
+        Returns:
+            tuple: The wrapped (func, afunc); afunc is None if none was given.
+        """
+        def wrapped(state, config):
+            thread_id = _thread_id(config)
+            token = _current.set((self, thread_id))
+            start = time.perf_counter()
+            try:
+                return func(state, config=config) if accepts_config(func) else func(state)
+            finally:
+                self.record("node", name, thread_id, wall_s=time.perf_counter() - start)
+                _current.reset(token)
+
+        async def awrapped(state, config):
+            thread_id = _thread_id(config)
+            token = _current.set((self, thread_id))
+            start = time.perf_counter()
+            try:
+                return await (afunc(state, config=config) if accepts_config(afunc) else afunc(state))
+            finally:
+                self.record("node", name, thread_id, wall_s=time.perf_counter() - start)
+                _current.reset(token)
+
+        return wrapped, (awrapped if afunc is not None else None)
+
+    def attach(self, config: Optional[dict]) -> dict:
+        """Returns a copy of a run config with the callback handler added."""
+        config = dict(config or {})
+        callbacks = config.get("callbacks")
+        if isinstance(callbacks, BaseCallbackManager):
+            callbacks = callbacks.copy()
+            callbacks.add_handler(self.callback_handler, inherit=True)
+        else:
+            callbacks = list(callbacks or []) + [self.callback_handler]
+        config["callbacks"] = callbacks
+        return config
+
+    def summary(self) -> dict:
+        """Returns the aggregated totals and the per-thread breakdown."""
+        with self._lock:
+            return {
+                "total": self._total.as_dict(),
+                "threads": {str(thread_id): stats.as_dict() for thread_id, stats in self._threads.items()},
+            }
+
+    def export(self, path: str) -> None:
+        """
+        Writes the summary to `path`: JSON for a `.json` file, otherwise the
+        Prometheus text exposition format (totals only, to keep label
+        cardinality bounded).
+        """
+        summary = self.summary()
+        with open(path, "w") as f:
+            if path.endswith(".json"):
+                json.dump(summary, f, indent=2)
+            else:
+                f.write(self.to_prometheus(summary["total"]))
+
+    @staticmethod
+    def to_prometheus(total: dict) -> str:
+        lines = []
+
+        def metric(name, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        metric("agents_node_calls_total", "Graph node executions.",
+               [({"node": n}, s["calls"]) for n, s in total["nodes"].items()])
+        metric("agents_node_seconds_total", "Wall time spent in graph nodes.",
+               [({"node": n}, s["wall_s"]) for n, s in total["nodes"].items()])
+        metric("agents_tool_calls_total", "Tool calls.",
+               [({"tool": n}, s["calls"]) for n, s in total["tools"].items()])
+        metric("agents_tool_errors_total", "Tool calls that raised an error.",
+               [({"tool": n}, s["errors"]) for n, s in total["tools"].items()])
+        metric("agents_tool_seconds_total", "Wall time spent in tools.",
+               [({"tool": n}, s["wall_s"]) for n, s in total["tools"].items()])
+        metric("agents_llm_calls_total", "Chat model calls.", [({}, total["llm"]["calls"])])
+        metric("agents_llm_seconds_total", "Wall time spent in chat model calls.", [({}, total["llm"]["wall_s"])])
+        metric("agents_llm_tokens_total", "Tokens used by chat model calls.",
+               [({"direction": "input"}, total["llm"]["input_tokens"]),
+                ({"direction": "output"}, total["llm"]["output_tokens"])])
+        metric("agents_cache_requests_total", "Tool cache lookups by result.",
+               [({"cache": n, "result": r}, count)
+                for n, s in total["caches"].items() for r, count in s.items()])
+        return "\n".join(lines) + "\n"
+
+class InstrumentationCallbackHandler(BaseCallbackHandler):
+    """Callback handler that turns LLM and tool runs into instrumentation events."""
+
+    # Cheap enough to run inline, also in async runs
+    run_inline = True
+
+    def __init__(self, instrumentation: Instrumentation):
+        self.instrumentation = instrumentation
+        self._runs: Dict[UUID, tuple] = {}
+
+    def _start(self, run_id: UUID, name: str, metadata: Optional[dict]) -> None:
+        self._runs[run_id] = (name, (metadata or {}).get("thread_id"), time.perf_counter())
+
+    def _end(self, run_id: UUID, kind: str, **fields: Any) -> None:
+        run = self._runs.pop(run_id, None)
+        if run is not None:
+            name, thread_id, start = run
+            self.instrumentation.record(kind, name, thread_id, wall_s=time.perf_counter() - start, **fields)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self._start(run_id, kwargs.get("name") or (serialized or {}).get("name", "llm"), metadata)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        self._start(run_id, kwargs.get("name") or (serialized or {}).get("name", "llm"), metadata)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        input_tokens = output_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    input_tokens += usage.get("input_tokens", 0)
+                    output_tokens += usage.get("output_tokens", 0)
+        if not (input_tokens or output_tokens):
+            token_usage = (response.llm_output or {}).get("token_usage") or {}
+            input_tokens = token_usage.get("prompt_tokens", 0)
+            output_tokens = token_usage.get("completion_tokens", 0)
+        self._end(run_id, "llm", input_tokens=input_tokens, output_tokens=output_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, "llm", error=str(error))
+
+    def on_tool_start(self, serialized, input_str, *, run_id, metadata=None, **kwargs):
+        self._start(run_id, kwargs.get("name") or (serialized or {}).get("name", "tool"), metadata)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id, "tool")
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, "tool", error=str(error))
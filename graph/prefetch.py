@@ -0,0 +1,283 @@
+"""
+Speculative tool prefetching while the supervisor decides.
+
+Without prefetching a run is strictly serial: the supervisor's routing call
+finishes, then the chosen agent's ReAct loop asks the model for a tool call,
+then the tool runs. For requests whose tool calls are easy to predict, such
+as a "$TSLA" ticker meaning FinancialAgent will call `alpha_vantage`, a
+`Prefetcher` starts those tool calls on a thread pool as soon as the request
+reaches the supervisor, so tool latency overlaps with the routing call.
+
+Results are kept per conversation (thread_id) and only for the current
+request. When the supervisor routes to an agent, `agent_node` takes that
+agent's prefetched results and hands them to the agent as tool calls it has
+already made, which also saves the agent the model call that would have
+requested them. Results that are not used are discarded when the run
+finishes or the next request on the thread starts. Patterns should be as
+specific as the pre-router's routes (see `agents.pre_router.KeywordRule`):
+a call predicted for a request that goes to another agent is wasted.
+
+Prefetched calls run with the callbacks of the supervisor's run and in a
+copy of its context, so instrumentation (including cache hits and misses)
+and tracing record them like the agent's own tool calls.
+
+Rules are configured in the "prefetch" section of `agent_config.json`:
+
+    "prefetch": {
+        "enabled": true,
+        "max_workers": 4,
+        "wait_seconds": 10,
+        "rules": [
+            {"agent": "FinancialAgent", "tool": "alpha_vantage",
+             "pattern": "\\$([A-Za-z]{1,5})\\b", "max_calls": 2}
+        ]
+    }
+
+The first non-empty group of each match (uppercased) is the tool input.
+"""
+import re
+import uuid
+import asyncio
+import logging
+import contextvars
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.runnables.config import RunnableConfig
+from langchain_core.runnables.utils import accepts_config
+from agents.pre_router import message_text
+from tools.tool_registry import TOOL_REGISTRY
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def _thread_id(config: Optional[RunnableConfig]) -> Optional[str]:
+    return ((config or {}).get("configurable") or {}).get("thread_id")
+
+def _tool_args(tool_name: str, tool_input: str):
+    # Single-argument tools take the input as their only argument
+    args = TOOL_REGISTRY[tool_name].args
+    return {next(iter(args)): tool_input} if len(args) == 1 else tool_input
+
+class PrefetchRule:
+    """
+    Predicts calls of `tool` by `agent` from the user's request.
+
+    Args:
+        agent (str): The agent whose tool call is predicted.
+        tool (str): The tool's name in `TOOL_REGISTRY`.
+        pattern (str): Regular expression whose first non-empty group (or
+                       whole match) is the tool input.
+        exclude (list): Inputs never prefetched, e.g. common acronyms.
+        max_calls (int): Maximum number of calls started per request.
+    """
+
+    def __init__(self, agent: str, tool: str, pattern: str, exclude: Optional[List[str]] = None,
+                 max_calls: int = 2):
+        self.agent = agent
+        self.tool = tool
+        self.pattern = re.compile(pattern)
+        self.exclude = {value.upper() for value in exclude or []}
+        self.max_calls = max_calls
+
+    def inputs(self, text: str) -> List[str]:
+        """Returns the distinct tool inputs predicted for `text`, in order of appearance."""
+        inputs = []
+        for match in self.pattern.finditer(text):
+            value = next((group for group in match.groups() if group), match.group(0)).upper()
+            if value not in self.exclude and value not in inputs:
+                inputs.append(value)
+                if len(inputs) == self.max_calls:
+                    break
+        return inputs
+
+class Prefetcher:
+    """
+    Starts predicted tool calls and keeps their results for the current request of each thread.
+
+    Args:
+        rules (list): The `PrefetchRule`s to apply.
+        max_workers (int): Threads running prefetched tool calls.
+        wait_seconds (float): How long an agent waits for a call still in
+                              flight before running without it.
+        max_threads (int): Number of conversations whose results are kept.
+    """
+
+    def __init__(self, rules: List[PrefetchRule], max_workers: int = 4, wait_seconds: float = 10.0,
+                 max_threads: int = 1024):
+        self.rules = rules
+        self.wait_seconds = wait_seconds
+        self.max_threads = max_threads
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        # thread_id -> {agent: [(tool name, input, future)]}
+        self._pending = OrderedDict()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.started = 0
+        self.used = 0
+        self.discarded = 0
+
+    @classmethod
+    def from_config(cls, config: Optional[dict], agents: Dict[str, dict]) -> Optional["Prefetcher"]:
+        """
+        Creates the prefetcher from the "prefetch" config section.
+
+        Rules for agents that are not configured, or tools the agent does not
+        have, are ignored.
+
+        Returns:
+            Prefetcher: The prefetcher, or None if the section is missing or disabled.
+        """
+        if not config or not config.get("enabled", True):
+            return None
+        rules = []
+        for rule_config in config.get("rules", []):
+            agent_config = agents.get(rule_config["agent"])
+            if agent_config is None or rule_config["tool"] not in agent_config.get("tools", []):
+                logger.warning(f"Ignoring prefetch rule for {rule_config['agent']}/{rule_config['tool']}")
+                continue
+            rules.append(PrefetchRule(**rule_config))
+        if not rules:
+            return None
+        return cls(
+            rules,
+            max_workers=config.get("max_workers", 4),
+            wait_seconds=config.get("wait_seconds", 10.0),
+        )
+
+    def start(self, state, config: Optional[RunnableConfig]) -> None:
+        """Starts the tool calls predicted for a new request; does nothing on later hops."""
+        thread_id = _thread_id(config)
+        messages = state["messages"]
+        if self._closed or thread_id is None or not messages or not isinstance(messages[-1], HumanMessage):
+            return
+        calls = {}
+        # Record the calls under the supervisor's run
+        call_config = {
+            "callbacks": config.get("callbacks"),
+            "metadata": {**(config.get("metadata") or {}), "prefetch": True},
+            "tags": ["prefetch"],
+        }
+        for rule in self.rules:
+            for tool_input in rule.inputs(message_text(messages[-1].content)):
+                # Each call gets its own copy, since a context runs in one thread at a time
+                future = self._executor.submit(contextvars.copy_context().run, self._call, rule.tool,
+                                               tool_input, call_config)
+                calls.setdefault(rule.agent, []).append((rule.tool, tool_input, future))
+        with self._lock:
+            self.started += sum(len(agent_calls) for agent_calls in calls.values())
+            self._drop(thread_id)
+            if calls:
+                self._pending[thread_id] = calls
+                while len(self._pending) > self.max_threads:
+                    self._drop(next(iter(self._pending)))
+        if calls:
+            logger.debug(f"Prefetching {calls} for thread {thread_id}")
+
+    @staticmethod
+    def _call(tool_name: str, tool_input: str, config: RunnableConfig):
+        return TOOL_REGISTRY[tool_name].invoke(_tool_args(tool_name, tool_input), config)
+
+    def _drop(self, thread_id: str) -> None:
+        # Caller holds the lock
+        for agent_calls in self._pending.pop(thread_id, {}).values():
+            for _, _, future in agent_calls:
+                future.cancel()
+                self.discarded += 1
+
+    def discard(self, config: Optional[RunnableConfig]) -> None:
+        """Discards the unused results of the thread's current request."""
+        thread_id = _thread_id(config)
+        if thread_id is not None:
+            with self._lock:
+                self._drop(thread_id)
+
+    def _take(self, config: Optional[RunnableConfig], agent: str) -> list:
+        thread_id = _thread_id(config)
+        with self._lock:
+            pending = self._pending.get(thread_id)
+            return pending.pop(agent, []) if pending else []
+
+    def _messages(self, calls: list) -> list:
+        # The completed calls as a tool-calling AI message followed by their results
+        done = []
+        for tool_name, tool_input, future in calls:
+            try:
+                done.append((tool_name, tool_input, future.result(timeout=0)))
+            except Exception as e:
+                # The agent calls the tool itself if it still needs it
+                logger.debug(f"Prefetched {tool_name}({tool_input}) is not usable: {e!r}")
+                with self._lock:
+                    self.discarded += 1
+        if not done:
+            return []
+        with self._lock:
+            self.used += len(done)
+        tool_calls = [
+            {"name": TOOL_REGISTRY[tool_name].name, "args": _tool_args(tool_name, tool_input),
+             "id": f"prefetch_{uuid.uuid4().hex}"}
+            for tool_name, tool_input, _ in done
+        ]
+        return [AIMessage(content="", tool_calls=tool_calls)] + [
+            ToolMessage(content=str(result), tool_call_id=call["id"], name=call["name"])
+            for call, (_, _, result) in zip(tool_calls, done)
+        ]
+
+    def messages_for(self, config: Optional[RunnableConfig], agent: str) -> list:
+        """
+        Takes `agent`'s prefetched results for the current request, waiting
+        up to `wait_seconds` for calls still in flight.
+
+        Returns:
+            list: Messages to append to the agent's input: an AI message with
+                  the tool calls and one tool message per result. Empty if
+                  nothing usable was prefetched for the agent.
+        """
+        calls = self._take(config, agent)
+        if calls:
+            wait([future for _, _, future in calls], timeout=self.wait_seconds)
+        return self._messages(calls)
+
+    async def amessages_for(self, config: Optional[RunnableConfig], agent: str) -> list:
+        """Async variant of `messages_for`."""
+        calls = self._take(config, agent)
+        if calls:
+            await asyncio.wait([asyncio.wrap_future(future) for _, _, future in calls], timeout=self.wait_seconds)
+        return self._messages(calls)
+
+    def wrap_supervisor(self, func: Callable, afunc: Callable):
+        """
+        Wraps the supervisor's sync and async functions to start prefetching
+        before routing a new request, and to discard unused results when it
+        finishes the run.
+        """
+        def wrapped(state, config):
+            self.start(state, config)
+            update = func(state, config=config) if accepts_config(func) else func(state)
+            if update.get("next") == "FINISH":
+                self.discard(config)
+            return update
+
+        async def awrapped(state, config):
+            self.start(state, config)
+            update = await (afunc(state, config=config) if accepts_config(afunc) else afunc(state))
+            if update.get("next") == "FINISH":
+                self.discard(config)
+            return update
+
+        return wrapped, awrapped
+
+    def close(self) -> None:
+        """Discards every pending result and stops the worker threads; later requests are not prefetched."""
+        with self._lock:
+            self._closed = True
+            for thread_id in list(self._pending):
+                self._drop(thread_id)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        """Returns the number of prefetched calls started, used by an agent and discarded."""
+        with self._lock:
+            return {"started": self.started, "used": self.used, "discarded": self.discarded}
@@ -0,0 +1,281 @@
+"""
+CPU profiling of graph runs, attributed per node.
+
+A `GraphProfiler` passed to `build_graph` (or `GraphFactory`) profiles the
+first `runs` runs of the graph, to find where orchestration overhead such as
+structured-output parsing, prompt templating or checkpoint serialization is
+spent. Network time is not what it measures. Two modes are available:
+
+- "sample" (default): a background thread samples the stacks of every
+  thread that is on the CPU every `interval_ms`, skipping threads blocked on
+  I/O where the platform can tell (Linux). Stacks under a node are rooted at
+  the node's name (the supervisor or an agent from `agent_config.json`);
+  the rest, e.g. checkpointing and stream plumbing, is rooted at "graph",
+  as is work a node hands to other threads, such as sync tools in async
+  runs.
+  Written as `stacks.collapsed`, one "root;frame;...;frame count" line per
+  stack, ready for flamegraph.pl or speedscope.
+- "deterministic": every sync node call runs under its own `cProfile`, and
+  the thread driving the run under another one for the time outside nodes.
+  Written as one `<node>.pstats` file per node, `graph.pstats` and a
+  combined `profile.pstats`. Async nodes share the driving thread's event
+  loop and are only covered by `graph.pstats`. Since Python 3.12 only one
+  `cProfile` can be active per process and it sees every thread, so a node
+  running in parallel with another profiled node is counted in that
+  node's profile.
+
+Both modes also write `nodes.json` with the calls, wall time and CPU time of
+every node.
+"""
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import logging
+import contextlib
+import threading
+from collections import Counter, defaultdict
+from typing import Callable, Optional
+from langchain_core.runnables.utils import accepts_config
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+MODES = ("sample", "deterministic")
+
+class GraphProfiler:
+    """
+    Profiles the first `runs` graph runs and writes the results to `output_dir`.
+
+    Args:
+        output_dir (str): Directory the profiles are written to.
+        runs (int): Number of graph runs to profile; 0 profiles every run.
+        mode (str): "sample" or "deterministic".
+        interval_ms (float): Sampling interval in "sample" mode.
+    """
+
+    def __init__(self, output_dir: str, runs: int = 1, mode: str = "sample", interval_ms: float = 5.0):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        self.output_dir = output_dir
+        self.runs = runs
+        self.mode = mode
+        self.interval = interval_ms / 1000
+        self.nodes = defaultdict(lambda: {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0})
+        self._stats = {}
+        self._stacks = Counter()
+        self._labels = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._started_runs = 0
+        self._active_runs = 0
+        self._sampler = None
+        self._stop = threading.Event()
+        self._node_codes = set()
+
+    @property
+    def active(self) -> bool:
+        """Whether a profiled run is in progress."""
+        return self._active_runs > 0
+
+    def _begin_run(self) -> bool:
+        with self._lock:
+            if self.runs and self._started_runs >= self.runs:
+                return False
+            self._started_runs += 1
+            self._active_runs += 1
+            if self.mode == "sample" and self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample, name="graph-profiler", daemon=True)
+                self._sampler.start()
+        return True
+
+    def _end_run(self, profile: Optional[cProfile.Profile]) -> None:
+        # A run may already have been ended by `write`
+        if profile is not None and profile not in getattr(self._local, "profiles", []):
+            return
+        self._disable("graph", profile)
+        with self._lock:
+            self._active_runs -= 1
+
+    def profile_run(self, events):
+        """Wraps the iterator returned by `graph.stream` so the run is profiled while it is consumed."""
+        with contextlib.closing(events):
+            if not self._begin_run():
+                yield from events
+                return
+            profile = self._enable("graph")
+            try:
+                yield from events
+            finally:
+                self._end_run(profile)
+
+    async def aprofile_run(self, events):
+        """Async variant of `profile_run` for `graph.astream`."""
+        async with contextlib.aclosing(events):
+            if not self._begin_run():
+                async for event in events:
+                    yield event
+                return
+            profile = self._enable("graph")
+            try:
+                async for event in events:
+                    yield event
+            finally:
+                self._end_run(profile)
+
+    def _enable(self, name: str) -> Optional[cProfile.Profile]:
+        # Only one profiler can run per thread: pause the enclosing one, if any
+        if self.mode != "deterministic":
+            return None
+        stack = self._local.__dict__.setdefault("profiles", [])
+        if stack:
+            stack[-1].disable()
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e:
+            # Another profiler (e.g. a debugger) is active
+            logger.debug(f"Cannot profile {name}: {e}")
+            if stack:
+                stack[-1].enable()
+            return None
+        stack.append(profile)
+        return profile
+
+    def _disable(self, name: str, profile: Optional[cProfile.Profile]) -> None:
+        if profile is None:
+            return
+        profile.disable()
+        stack = self._local.profiles
+        stack.pop()
+        if stack:
+            stack[-1].enable()
+        with self._lock:
+            if name in self._stats:
+                self._stats[name].add(profile)
+            else:
+                self._stats[name] = pstats.Stats(profile)
+
+    def _record(self, name: str, wall_s: float, cpu_s: float) -> None:
+        with self._lock:
+            node = self.nodes[name]
+            node["calls"] += 1
+            node["wall_s"] += wall_s
+            node["cpu_s"] += cpu_s
+
+    def wrap_node(self, name: str, func: Callable, afunc: Optional[Callable] = None):
+        """
+        Wraps a node's sync and async functions to time and profile every
+        call made during a profiled run.
+
+        Returns:
+            tuple: The wrapped (func, afunc); afunc is None if none was given.
+        """
+        def profiled_node(state, config):
+            if not self.active:
+                return func(state, config=config) if accepts_config(func) else func(state)
+            start, cpu_start = time.perf_counter(), time.thread_time()
+            profile = self._enable(name)
+            try:
+                return func(state, config=config) if accepts_config(func) else func(state)
+            finally:
+                self._disable(name, profile)
+                self._record(name, time.perf_counter() - start, time.thread_time() - cpu_start)
+
+        async def aprofiled_node(state, config):
+            if not self.active:
+                return await (afunc(state, config=config) if accepts_config(afunc) else afunc(state))
+            # CPU time includes other tasks that ran on the loop meanwhile
+            start, cpu_start = time.perf_counter(), time.thread_time()
+            try:
+                return await (afunc(state, config=config) if accepts_config(afunc) else afunc(state))
+            finally:
+                self._record(name, time.perf_counter() - start, time.thread_time() - cpu_start)
+
+        # The sampler recognizes node frames by these code objects
+        self._node_codes.update((profiled_node.__code__, aprofiled_node.__code__))
+        return profiled_node, (aprofiled_node if afunc is not None else None)
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            path = code.co_filename
+            for marker in ("site-packages" + os.sep, os.getcwd() + os.sep):
+                if marker in path:
+                    path = path.split(marker, 1)[1]
+                    break
+            label = f"{code.co_name} ({path}:{code.co_firstlineno})".replace(";", ",")
+            self._labels[code] = label
+        return label
+
+    def _collapse(self, frame) -> str:
+        frames = []
+        root = "graph"
+        while frame is not None:
+            if frame.f_code in self._node_codes:
+                root = frame.f_locals.get("name", "node")
+                break
+            frames.append(self._label(frame.f_code))
+            frame = frame.f_back
+        return ";".join([root] + frames[::-1])
+
+    def _on_cpu(self, ident: int, clocks: dict) -> bool:
+        # A thread counts if it used at least half the interval's CPU time since the last sample
+        try:
+            used = time.clock_gettime(time.pthread_getcpuclockid(ident))
+        except AttributeError:
+            # No per-thread CPU clocks on this platform: sample wall-clock stacks
+            return True
+        except OSError:
+            return False
+        previous = clocks.get(ident)
+        clocks[ident] = used
+        return previous is not None and used - previous >= self.interval / 2
+
+    def _sample(self) -> None:
+        own = threading.get_ident()
+        clocks = {}
+        while not self._stop.wait(self.interval):
+            if not self.active:
+                continue
+            for ident, frame in sys._current_frames().items():
+                if ident != own and self._on_cpu(ident, clocks):
+                    stack = self._collapse(frame)
+                    with self._lock:
+                        self._stacks[stack] += 1
+
+    def write(self) -> str:
+        """
+        Stops sampling and writes the profiles; returns the output directory.
+
+        Runs this thread is still consuming, e.g. when the caller stopped
+        reading events at the supervisor's FINISH, are ended first.
+        """
+        for profile in list(getattr(self._local, "profiles", [])):
+            self._end_run(profile)
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        os.makedirs(self.output_dir, exist_ok=True)
+        with self._lock:
+            if self.mode == "sample":
+                with open(os.path.join(self.output_dir, "stacks.collapsed"), "w") as f:
+                    for stack, count in self._stacks.most_common():
+                        f.write(f"{stack} {count}\n")
+            elif self._stats:
+                paths = []
+                for name, stats in self._stats.items():
+                    paths.append(os.path.join(self.output_dir, f"{name}.pstats"))
+                    stats.dump_stats(paths[-1])
+                pstats.Stats(*paths).dump_stats(os.path.join(self.output_dir, "profile.pstats"))
+            summary = {
+                "mode": self.mode,
+                "runs": self._started_runs,
+                "samples": sum(self._stacks.values()),
+                "nodes": {name: dict(node) for name, node in self.nodes.items()},
+            }
+        with open(os.path.join(self.output_dir, "nodes.json"), "w") as f:
+            json.dump(summary, f, indent=2)
+        return self.output_dir
@@ -1,9 +1,60 @@
-from typing import Annotated, Sequence
+from itertools import zip_longest
+from typing import Annotated, Iterable, Sequence
 from typing_extensions import TypedDict
 from langchain_core.messages import HumanMessage
 import operator
 
+def replace_value(left, right):
+    """Reducer that keeps the latest write, allowing parallel nodes to write the same key."""
+    return right
+
+def add_turn_counts(left: tuple[int, ...], right: tuple[int, ...]) -> tuple[int, ...]:
+    """
+    Reducer for agent_turn_counts: adds per-agent deltas element-wise.
+
+    Nodes write a one-hot delta (see `TurnCounter.increment`), so parallel
+    branches merge by addition and no node has to copy the counts. Writing an
+    empty tuple resets the counts, which is how a new user turn starts.
+    """
+    if not right:
+        return ()
+    if not left:
+        return tuple(right)
+    return tuple(a + b for a, b in zip_longest(left, right, fillvalue=0))
+
+class TurnCounter:
+    """
+    Fixed-index view over agent_turn_counts.
+
+    Counts are stored as a tuple with one slot per agent known when the graph
+    is built, which keeps checkpoints small and constant in size however long
+    the conversation gets.
+    """
+
+    def __init__(self, names: Iterable[str]):
+        self.names = tuple(names)
+        self._index = {name: i for i, name in enumerate(self.names)}
+        # Precompute the one-hot deltas so nodes never allocate new ones
+        self._deltas = {
+            name: tuple(int(i == index) for i in range(len(self.names)))
+            for name, index in self._index.items()
+        }
+
+    def increment(self, name: str) -> tuple[int, ...]:
+        """Returns the delta that adds one turn for `name`."""
+        return self._deltas[name]
+
+    def get(self, counts: Sequence[int], name: str) -> int:
+        """Returns the number of turns `name` has taken."""
+        index = self._index[name]
+        return counts[index] if counts and index < len(counts) else 0
+
+    def as_dict(self, counts: Sequence[int]) -> dict[str, int]:
+        """Returns the counts keyed by agent name."""
+        return {name: self.get(counts, name) for name in self.names}
+
 class AgentState(TypedDict):
     messages: Annotated[Sequence[HumanMessage], operator.add]
-    next: str
-    agent_turn_counts: dict[str, int]
+    next: Annotated[str, replace_value]
+    next_agents: list[str]
+    agent_turn_counts: Annotated[tuple[int, ...], add_turn_counts]
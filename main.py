@@ -1,55 +1,247 @@
-import json
+import argparse
+import asyncio
+import uuid
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage
-from graph.builder import build_graph
+from langchain_core.messages import AIMessageChunk, HumanMessage
+from graph.factory import GraphFactory
+from graph.answer_cache import acached_answer, aremember_answer, cached_answer, remember_answer
+from graph.instrumentation import Instrumentation
+from graph.profiling import MODES as PROFILE_MODES, GraphProfiler
 from langgraph.graph import END
+from tools.transport import llm_http_clients
 from dotenv import load_dotenv
 
 # Load environment variables
 from dotenv import load_dotenv
 _ = load_dotenv()
 
-def process_event(event):
+CONFIG_PATH = "agent_config.json"
+
+def process_event(event, streamed=()):
     for key, value in event.items():
-        if "messages" in value and value["messages"]:
+        # Skip answers whose tokens were already printed as they arrived
+        if "messages" in value and value["messages"] and key not in streamed:
             agent_name = value["messages"][-1].name
             content = value["messages"][-1].content
             print(f"--- {agent_name} ---\n{content}\n")
-        if "next" in value:
+        if len(value.get("next_agents") or []) > 1:
+            print(f"--- Supervisor ---\nSupervisor dispatches in parallel: {', '.join(value['next_agents'])}\n")
+        elif "next" in value:
             print(f"--- Supervisor ---\nSupervisor decides the next agent: {value['next']}\n")
 
-def main():
+class TokenPrinter:
+    """
+    Prints LLM tokens as they arrive, under a header naming the agent that
+    produces them, one agent at a time. Tokens of agents running in parallel
+    with the one being printed are buffered and printed once it finishes.
+    """
+
+    def __init__(self):
+        self.current = None
+        # Agent -> tokens not printed yet, in the order the agents started
+        self.buffers = {}
+        self.finished = set()
+        self.streamed = set()
+
+    def token(self, message, metadata):
+        # Only agent text; tool-call chunks have no content, and the supervisor's
+        # structured output is not streamed
+        if not isinstance(message, AIMessageChunk) or not isinstance(message.content, str) or not message.content:
+            return
+        # The checkpoint namespace starts with the top-level node, e.g. "CodeAgent:<id>|agent:<id>"
+        agent_name = metadata.get("langgraph_checkpoint_ns", "").split("|")[0].split(":")[0]
+        # An agent that finished earlier in the run may be running again
+        self.finished.discard(agent_name)
+        self.streamed.add(agent_name)
+        if self.current is None:
+            self._start(agent_name)
+        if agent_name == self.current:
+            print(message.content, end="", flush=True)
+        else:
+            self.buffers.setdefault(agent_name, []).append(message.content)
+
+    def _start(self, agent_name):
+        print(f"--- {agent_name} ---")
+        print("".join(self.buffers.pop(agent_name, [])), end="", flush=True)
+        self.current = agent_name
+
+    def finish(self, nodes):
+        """Marks `nodes` as done; once the agent being printed is, moves on to the next buffered one."""
+        self.finished.update(nodes)
+        while self.current is not None and self.current in self.finished:
+            self._next()
+
+    def _next(self):
+        print("\n")
+        self.current = None
+        if self.buffers:
+            self._start(next(iter(self.buffers)))
+
+    def end(self):
+        """Prints everything still buffered, e.g. when the run stops early."""
+        while self.current is not None:
+            self._next()
+
+def print_cached_answer(hit):
+    for agent, answer in hit["answers"]:
+        print(f"--- {agent} (cached) ---\n{answer}\n")
+
+def stream_mode(stream_tokens):
+    return ["updates", "messages"] if stream_tokens else "updates"
+
+def report_stats(graph, metrics_path=None):
+    # Show how many routing decisions skipped the supervisor LLM call
+    if graph.pre_router is not None:
+        stats = graph.pre_router.stats()
+        print(f"Pre-router decided {stats['hits']}/{stats['calls']} routes ({stats['hit_rate']:.0%}) without the LLM.")
+    if graph.routing_batcher is not None:
+        stats = graph.routing_batcher.stats()
+        print(f"Supervisor sent {stats['requests']} routing calls in {stats['batches']} batches.")
+    if graph.prefetcher is not None:
+        stats = graph.prefetcher.stats()
+        print(f"Prefetched {stats['started']} tool calls; {stats['used']} used, {stats['discarded']} discarded.")
+    if graph.answer_cache is not None:
+        stats = graph.answer_cache.stats()
+        print(f"Answer cache served {stats['hits']}/{stats['lookups']} requests ({stats['hit_rate']:.0%}).")
+    # Write the per-node, LLM, tool and cache metrics of the session
+    if metrics_path and graph.instrumentation is not None:
+        graph.instrumentation.export(metrics_path)
+        print(f"Metrics written to {metrics_path}")
+    # Write the CPU profiles of the profiled runs
+    if graph.profiler is not None:
+        print(f"Profiles written to {graph.profiler.write()}")
+
+def thread_config(thread_id=None):
+    # Continue the given conversation, or start a new one for this input
+    thread_id = thread_id or str(uuid.uuid4())
+    print(f"(thread_id: {thread_id})")
+    return {"configurable": {"thread_id": thread_id}}
+
+def create_factory(metrics_path=None, profiler=None):
     # Define the LLM
-    llm = ChatOpenAI(model="gpt-4o", temperature=0)
+    llm = ChatOpenAI(model="gpt-4o", temperature=0, **llm_http_clients())
+
+    # Build graphs from the configuration, instrumented when metrics are requested
+    # and profiled with --profile
+    return GraphFactory(llm, instrumentation=Instrumentation() if metrics_path else None, profiler=profiler)
+
+def load_graph(factory):
+    # Pick up edits to agent_config.json; only changed agents are rebuilt
+    return factory.from_file(CONFIG_PATH)
+
+def user_request(user_input):
+    return {"messages": [HumanMessage(content=user_input)]}
 
-    # Load the configuration
-    with open("agent_config.json", 'r') as f:
-        config_json = json.load(f)
+def handle_event(event, printer, stream_tokens):
+    """Prints one streamed event; returns True when the process has finished."""
+    if stream_tokens:
+        mode, event = event
+        if mode == "messages":
+            printer.token(*event)
+            return False
+        printer.finish(event.keys())
+    process_event(event, printer.streamed)
+    # Check if the process should finish, or for the END node in the event keys
+    if event.get("next") == "FINISH" or END in event:
+        print("Process finished.")
+        return True
+    return False
 
-    # Build the graph
-    graph = build_graph(llm, config_json)
-    thread_id = 1
+def run_request(graph, user_input, thread_id=None, stream_tokens=False):
+    """Answers one input, from the answer cache or by running the graph; returns True when finished."""
+    config = thread_config(thread_id)
+    # Answer near-duplicates of earlier requests without running the graph
+    if (hit := cached_answer(graph, user_input, config)) is not None:
+        print_cached_answer(hit)
+        return False
+    printer = TokenPrinter()
+    for event in graph.stream(user_request(user_input), config=config, stream_mode=stream_mode(stream_tokens)):
+        if handle_event(event, printer, stream_tokens):
+            return True
+    printer.end()
+    remember_answer(graph, user_input, config)
+    return False
+
+async def arun_request(graph, user_input, thread_id=None, stream_tokens=False):
+    """Async variant of `run_request`."""
+    config = thread_config(thread_id)
+    if (hit := await acached_answer(graph, user_input, config)) is not None:
+        print_cached_answer(hit)
+        return False
+    printer = TokenPrinter()
+    async for event in graph.astream(user_request(user_input), config=config, stream_mode=stream_mode(stream_tokens)):
+        if handle_event(event, printer, stream_tokens):
+            return True
+    printer.end()
+    await aremember_answer(graph, user_input, config)
+    return False
+
+def main(thread_id=None, metrics_path=None, stream_tokens=False, profiler=None):
+    factory = create_factory(metrics_path, profiler)
+    graph = load_graph(factory)
     # Run the graph in a loop
-    while True:
-        thread_id += 1
-        config = {"configurable": {"thread_id": str(thread_id)}}
-        user_input = input("You: ")
-        if user_input.lower() == "exit":
-            break
-        events = graph.stream(
-            {"messages": [HumanMessage(content=user_input)]},
-            config=config
-        )
-        for event in events:
-            process_event(event)
-            # Check if the process should finish
-            if event.get("next") == "FINISH":
-                print("Process finished.")
+    try:
+        while True:
+            user_input = input("You: ")
+            if user_input.lower() == "exit":
+                break
+            graph = load_graph(factory)
+            if run_request(graph, user_input, thread_id, stream_tokens):
                 return
-            # Check for END node in the event keys
-            if END in event:
-                print("Process finished.")
+    finally:
+        # Report on every way out: exit, a finished run or Ctrl-C, then stop
+        # the graphs' worker threads and commit buffered checkpoints
+        report_stats(graph, metrics_path)
+        factory.close()
+
+async def amain(thread_id=None, metrics_path=None, stream_tokens=False, profiler=None):
+    """
+    Async variant of `main` that drives the graph with `astream`.
+
+    Node execution, LLM and tool calls are awaited on the event loop instead
+    of blocking a thread, which is the mode to use when embedding the graph
+    in an async server that serves many conversations at once.
+    """
+    factory = create_factory(metrics_path, profiler)
+    graph = load_graph(factory)
+    try:
+        while True:
+            # Read input off the event loop so other tasks keep running
+            user_input = await asyncio.to_thread(input, "You: ")
+            if user_input.lower() == "exit":
+                break
+            graph = load_graph(factory)
+            if await arun_request(graph, user_input, thread_id, stream_tokens):
                 return
+    finally:
+        # Report on every way out: exit, a finished run or Ctrl-C, then stop
+        # the graphs' worker threads and commit buffered checkpoints
+        report_stats(graph, metrics_path)
+        factory.close()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the multi-agent system.")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="Drive the graph with astream on an asyncio event loop.")
+    parser.add_argument("--thread-id",
+                        help="Continue an existing conversation; every input is added to this thread.")
+    parser.add_argument("--metrics",
+                        help="Record per-node, LLM, tool and cache metrics and write them to this file on exit "
+                             "(JSON for a .json file, otherwise Prometheus text format).")
+    parser.add_argument("--stream-tokens", action="store_true",
+                        help="Print the agents' answers token by token as the model produces them.")
+    parser.add_argument("--profile", metavar="DIR",
+                        help="CPU-profile graph runs, attributed per node, and write the profiles to DIR on exit.")
+    parser.add_argument("--profile-runs", type=int, default=1,
+                        help="Number of graph runs to profile with --profile (0 profiles every run).")
+    parser.add_argument("--profile-mode", choices=PROFILE_MODES, default="sample",
+                        help="Sample stacks into stacks.collapsed, or profile deterministically into .pstats files.")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    profiler = GraphProfiler(args.profile, runs=args.profile_runs, mode=args.profile_mode) if args.profile else None
+    if args.use_async:
+        asyncio.run(amain(args.thread_id, args.metrics, args.stream_tokens, profiler))
+    else:
+        main(args.thread_id, args.metrics, args.stream_tokens, profiler)
@@ -0,0 +1,326 @@
+"""
+HTTP server for the multi-agent graph, backed by several worker processes.
+
+Requests are put on a bounded queue and handed to `--workers` worker
+processes, each running its own graph (built through `GraphFactory` from the
+agent config, so edits are picked up without a restart) on an asyncio event
+loop with at most `--worker-concurrency` requests at a time. When every
+worker is at its limit, requests wait in the queue; when the queue holds
+`--max-queue` requests, new ones are rejected with 503 and a Retry-After
+header instead of piling up.
+
+State that has to outlive one request is kept in shared local stores:
+conversations in the SQLite checkpointer configured in `agent_config.json`
+and Alpha Vantage responses in the SQLite file at `ALPHAVANTAGE_CACHE_PATH`.
+Workers commit a thread's checkpoints before replying, so the next request on
+that `thread_id` can go to any worker. Requests on the same thread are run
+one at a time, in order. The answer cache and rate limiters stay per worker.
+
+Usage:
+    uv run python server.py --workers 4 --worker-concurrency 8 --max-queue 64
+
+    curl -s localhost:8000/chat -d '{"message": "How is AAPL doing?"}'
+    curl -s localhost:8000/chat -d '{"message": "And MSFT?", "thread_id": "<thread_id>"}'
+    curl -s localhost:8000/stats
+"""
+import os
+import json
+import uuid
+import asyncio
+import argparse
+import logging
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, TimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dotenv import load_dotenv
+
+# Load environment variables
+_ = load_dotenv()
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class Overloaded(Exception):
+    """Raised when the request queue is full."""
+
+def _error_result(request_id: str, thread_id: str, error: str) -> dict:
+    return {"id": request_id, "thread_id": thread_id, "answer": None, "route": [], "error": error}
+
+async def _serve(index: int, config_path: str, model: str, inbox, outbox) -> None:
+    # Imported in the worker only; the front process never loads the graph
+    from langchain_openai import ChatOpenAI
+    from batch import run_prompt
+    from graph.factory import GraphFactory
+    from tools.transport import llm_http_clients
+
+    factory = GraphFactory(ChatOpenAI(model=model, temperature=0, **llm_http_clients()))
+    loop = asyncio.get_running_loop()
+    tasks = set()
+
+    async def handle(request_id: str, thread_id: str, message: str):
+        try:
+            graph = factory.from_file(config_path)
+            result = await run_prompt(graph, request_id, message, "", thread_id=thread_id)
+            # Commit buffered checkpoints so any worker can continue the thread,
+            # off the event loop since it writes to disk
+            flush = getattr(graph.checkpointer, "flush", None)
+            if flush is not None:
+                await loop.run_in_executor(None, flush)
+        except Exception as e:
+            logger.error(f"Worker {index} failed on request {request_id}: {e}", exc_info=True)
+            result = _error_result(request_id, thread_id, f"{type(e).__name__}: {e}")
+        outbox.put((index, request_id, result))
+
+    while (item := await loop.run_in_executor(None, inbox.get)) is not None:
+        task = asyncio.create_task(handle(*item))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    await asyncio.gather(*tasks)
+    await loop.run_in_executor(None, factory.close)
+
+def _worker(index: int, config_path: str, model: str, inbox, outbox) -> None:
+    asyncio.run(_serve(index, config_path, model, inbox, outbox))
+
+class Dispatcher:
+    """
+    Queues requests and hands them to worker processes.
+
+    Args:
+        config_path (str): Agent configuration file used by every worker.
+        model (str): OpenAI model used by all agents.
+        workers (int): Number of worker processes.
+        worker_concurrency (int): Requests each worker runs at the same time.
+        max_queue (int): Requests waiting for a worker before new ones are
+                         rejected.
+    """
+
+    def __init__(self, config_path: str, model: str = "gpt-4o", workers: int = 2,
+                 worker_concurrency: int = 8, max_queue: int = 64):
+        self.config_path = config_path
+        self.model = model
+        self.worker_concurrency = worker_concurrency
+        self.max_queue = max_queue
+        self._context = multiprocessing.get_context("spawn")
+        self._outbox = self._context.Queue()
+        self._workers = [None] * workers
+        # Per worker: request id -> (thread id, future)
+        self._inflight = [{} for _ in range(workers)]
+        self._pending = deque()
+        self._busy_threads = set()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.completed = 0
+        self.rejected = 0
+        self.restarts = 0
+
+    def start(self) -> None:
+        """Starts the worker processes and the dispatching threads."""
+        for index in range(len(self._workers)):
+            self._spawn(index)
+        threading.Thread(target=self._dispatch, name="dispatcher", daemon=True).start()
+        threading.Thread(target=self._collect, name="collector", daemon=True).start()
+
+    def _spawn(self, index: int) -> None:
+        inbox = self._context.Queue()
+        process = self._context.Process(
+            target=_worker,
+            args=(index, self.config_path, self.model, inbox, self._outbox),
+            name=f"graph-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        self._workers[index] = (process, inbox)
+
+    def submit(self, message: str, thread_id: str = None) -> Future:
+        """
+        Queues a message for the conversation `thread_id` (a new one if None).
+
+        Returns:
+            Future: Resolves to the result record of `batch.run_prompt`.
+
+        Raises:
+            Overloaded: If `max_queue` requests are already waiting.
+        """
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("The dispatcher is closed.")
+            if len(self._pending) >= self.max_queue:
+                self.rejected += 1
+                raise Overloaded(f"{len(self._pending)} requests are already waiting")
+            self._pending.append((uuid.uuid4().hex, thread_id or str(uuid.uuid4()), message, future))
+            self._cond.notify_all()
+        return future
+
+    def _next(self):
+        # Caller holds the lock. The oldest request whose thread is idle, and
+        # the least loaded worker with room for it
+        free = [i for i, inflight in enumerate(self._inflight) if len(inflight) < self.worker_concurrency]
+        if not free:
+            return None
+        for item in self._pending:
+            if item[1] not in self._busy_threads:
+                self._pending.remove(item)
+                return min(free, key=lambda i: len(self._inflight[i])), item
+        return None
+
+    def _dispatch(self) -> None:
+        with self._cond:
+            while not self._closed:
+                self._check_workers()
+                selected = self._next()
+                if selected is None:
+                    self._cond.wait(timeout=1.0)
+                    continue
+                index, (request_id, thread_id, message, future) = selected
+                self._inflight[index][request_id] = (thread_id, future)
+                self._busy_threads.add(thread_id)
+                self._workers[index][1].put((request_id, thread_id, message))
+
+    def _collect(self) -> None:
+        while (item := self._outbox.get()) is not None:
+            index, request_id, result = item
+            with self._cond:
+                entry = self._inflight[index].pop(request_id, None)
+                if entry is not None:
+                    self._busy_threads.discard(entry[0])
+                    self.completed += 1
+                self._cond.notify_all()
+            if entry is not None:
+                entry[1].set_result(result)
+
+    def _check_workers(self) -> None:
+        # Caller holds the lock. Fail the requests of a dead worker and replace it
+        for index, (process, _) in enumerate(self._workers):
+            if process.is_alive():
+                continue
+            logger.error(f"Worker {index} exited with code {process.exitcode}; restarting it")
+            for request_id, (thread_id, future) in self._inflight[index].items():
+                self._busy_threads.discard(thread_id)
+                future.set_result(_error_result(request_id, thread_id, f"Worker {index} exited"))
+            self._inflight[index].clear()
+            self._spawn(index)
+            self.restarts += 1
+
+    def stats(self) -> dict:
+        """Returns the queue length, requests in flight per worker and request counters."""
+        with self._cond:
+            return {
+                "queued": len(self._pending),
+                "in_flight": [len(inflight) for inflight in self._inflight],
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "worker_restarts": self.restarts,
+            }
+
+    def close(self, timeout: float = 30.0) -> None:
+        """
+        Stops accepting requests, lets the workers finish theirs and stops
+        them. Requests still queued, or not answered by then, are failed.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for _, inbox in self._workers:
+            inbox.put(None)
+        for process, _ in self._workers:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._outbox.put(None)
+        with self._cond:
+            unanswered = [(request_id, thread_id, future)
+                          for request_id, thread_id, _, future in self._pending]
+            unanswered += [(request_id, thread_id, future)
+                           for inflight in self._inflight for request_id, (thread_id, future) in inflight.items()]
+            self._pending.clear()
+            for inflight in self._inflight:
+                inflight.clear()
+            self._busy_threads.clear()
+        for request_id, thread_id, future in unanswered:
+            if not future.done():
+                future.set_result(_error_result(request_id, thread_id, "The server is shutting down"))
+
+class ChatHandler(BaseHTTPRequestHandler):
+    """Serves POST /chat and GET /stats from the server's dispatcher."""
+
+    def _reply(self, status: int, body: dict, headers: dict = None) -> None:
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path != "/stats":
+            return self._reply(404, {"error": "Not found"})
+        self._reply(200, self.server.dispatcher.stats())
+
+    def do_POST(self):
+        if self.path != "/chat":
+            return self._reply(404, {"error": "Not found"})
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            message = body["message"]
+        except (ValueError, KeyError, TypeError):
+            return self._reply(400, {"error": 'Expected a JSON object with a "message"'})
+        try:
+            future = self.server.dispatcher.submit(message, body.get("thread_id"))
+        except Overloaded as e:
+            return self._reply(503, {"error": f"Server busy: {e}"}, {"Retry-After": "1"})
+        try:
+            result = future.result(timeout=self.server.request_timeout)
+        except TimeoutError:
+            return self._reply(504, {"error": "The request is still running"})
+        self._reply(200 if result["error"] is None else 500, result)
+
+    def log_message(self, format, *args):
+        logger.info(f"{self.address_string()} {format % args}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve the multi-agent graph over HTTP from worker processes.")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on.")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes.")
+    parser.add_argument("--worker-concurrency", type=int, default=8, help="Requests each worker runs at the same time.")
+    parser.add_argument("--max-queue", type=int, default=64,
+                        help="Requests waiting for a worker before new ones are rejected with 503.")
+    parser.add_argument("--request-timeout", type=float, default=300.0,
+                        help="Seconds to wait for an answer before replying with 504.")
+    parser.add_argument("--config", default="agent_config.json", help="Agent configuration file.")
+    parser.add_argument("--model", default="gpt-4o", help="OpenAI model used by all agents.")
+    args = parser.parse_args()
+    with open(args.config, "r") as f:
+        backend = (json.load(f).get("checkpointer") or {}).get("backend", "memory")
+    if args.workers > 1 and backend != "sqlite":
+        parser.error('Several workers need the "sqlite" checkpointer backend to share conversations.')
+    return args
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(message)s")
+    # Workers share tool responses through a SQLite cache unless configured otherwise
+    os.environ.setdefault("ALPHAVANTAGE_CACHE_PATH", "alpha_vantage_cache.sqlite")
+
+    dispatcher = Dispatcher(args.config, args.model, args.workers, args.worker_concurrency, args.max_queue)
+    dispatcher.start()
+    server = ThreadingHTTPServer((args.host, args.port), ChatHandler)
+    server.daemon_threads = True
+    server.dispatcher = dispatcher
+    server.request_timeout = args.request_timeout
+    logger.info(f"Serving on http://{args.host}:{args.port} with {args.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        dispatcher.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import threading
+import pytest
+from tools.cache import TTLCache
+
+def test_get_or_compute_caches_values():
+    cache = TTLCache("test")
+    calls = []
+    assert cache.get_or_compute("key", lambda: calls.append(1) or "value", ttl=60) == "value"
+    assert cache.get_or_compute("key", lambda: calls.append(1) or "other", ttl=60) == "value"
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+def test_expired_entries_are_missing():
+    cache = TTLCache("test")
+    cache.set("key", "value", ttl=-1)
+    assert cache.get("key") == (False, None)
+
+def test_concurrent_requests_are_coalesced():
+    cache = TTLCache("test")
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "value"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(cache.get_or_compute("key", compute, ttl=60)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(cache.get_or_compute("key", compute, ttl=60)))
+                 for _ in range(4)]
+    for follower in followers:
+        follower.start()
+    # Let the followers reach the in-flight request before the leader finishes
+    while cache.stats()["coalesced"] < 4:
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+
+    assert results == ["value"] * 5
+    assert len(calls) == 1
+    assert cache.stats()["coalesced"] == 4
+
+def test_errors_reach_every_caller_and_are_not_cached():
+    cache = TTLCache("test")
+
+    def fail():
+        raise RuntimeError("upstream failed")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute("key", fail, ttl=60)
+    assert cache.get_or_compute("key", lambda: "value", ttl=60) == "value"
+
+def test_should_cache_rejects_values():
+    cache = TTLCache("test")
+    cache.get_or_compute("key", lambda: "error", ttl=60, should_cache=lambda value: value != "error")
+    assert cache.get("key") == (False, None)
+
+def test_entries_persist_to_disk(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    TTLCache("test", path=path).set("key", {"price": 1.5}, ttl=60)
+    assert TTLCache("test", path=path).get("key") == (True, {"price": 1.5})
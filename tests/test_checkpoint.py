@@ -0,0 +1,102 @@
+import sqlite3
+import time
+import pytest
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.memory import MemorySaver
+from graph.checkpoint import SqliteCheckpointSaver, create_checkpointer
+
+def config(thread_id, checkpoint_id=None):
+    configurable = {"thread_id": thread_id, "checkpoint_ns": ""}
+    if checkpoint_id:
+        configurable["checkpoint_id"] = checkpoint_id
+    return {"configurable": configurable}
+
+def put(saver, thread_id, parent=None, step=0):
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = {"step": step}
+    return checkpoint, saver.put(config(thread_id, parent), checkpoint, {"step": step}, {})
+
+def count_rows(path, thread_id):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM checkpoints WHERE thread_id = ?", (thread_id,)).fetchone()[0]
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "checkpoints.sqlite")
+
+def test_put_and_get_round_trip(path):
+    saver = SqliteCheckpointSaver(path, batch_size=100, flush_interval_seconds=60)
+    first, first_config = put(saver, "t1", step=1)
+    second, second_config = put(saver, "t1", parent=first["id"], step=2)
+    saver.put_writes(second_config, [("messages", "hello")], task_id="task")
+
+    latest = saver.get_tuple(config("t1"))
+    assert latest.checkpoint["id"] == second["id"]
+    assert latest.checkpoint["channel_values"] == {"step": 2}
+    assert latest.metadata == {"step": 2}
+    assert latest.parent_config["configurable"]["checkpoint_id"] == first["id"]
+    assert latest.pending_writes == [("task", "messages", "hello")]
+    assert saver.get_tuple(first_config).checkpoint["channel_values"] == {"step": 1}
+    assert saver.get_tuple(config("missing")) is None
+    saver.close()
+
+def test_list_is_newest_first_and_filters(path):
+    saver = SqliteCheckpointSaver(path)
+    ids = []
+    parent = None
+    for step in range(3):
+        checkpoint, _ = put(saver, "t1", parent=parent, step=step)
+        ids.append(checkpoint["id"])
+        parent = checkpoint["id"]
+    put(saver, "t2", step=0)
+
+    assert [c.checkpoint["id"] for c in saver.list(config("t1"))] == ids[::-1]
+    assert [c.checkpoint["id"] for c in saver.list(config("t1"), limit=1)] == ids[-1:]
+    assert [c.checkpoint["id"] for c in saver.list(config("t1"), before=config("t1", ids[-1]))] == ids[-2::-1]
+    assert [c.metadata["step"] for c in saver.list(config("t1"), filter={"step": 1})] == [1]
+    assert len(list(saver.list(None))) == 4
+    saver.close()
+
+def test_prunes_old_checkpoints(path):
+    saver = SqliteCheckpointSaver(path, batch_size=1, max_checkpoints_per_thread=2)
+    parent = None
+    for step in range(5):
+        checkpoint, _ = put(saver, "t1", parent=parent, step=step)
+        parent = checkpoint["id"]
+    assert [c.metadata["step"] for c in saver.list(config("t1"))] == [4, 3]
+    saver.close()
+
+def test_survives_reopening(path):
+    saver = SqliteCheckpointSaver(path, batch_size=100, flush_interval_seconds=60)
+    checkpoint, _ = put(saver, "t1")
+    saver.close()
+    reopened = SqliteCheckpointSaver(path)
+    assert reopened.get_tuple(config("t1")).checkpoint["id"] == checkpoint["id"]
+    reopened.close()
+
+def test_flushes_buffered_writes_without_further_calls(path):
+    saver = SqliteCheckpointSaver(path, batch_size=100, flush_interval_seconds=0.1)
+    put(saver, "t1")
+    assert count_rows(path, "t1") == 0
+    deadline = time.monotonic() + 5
+    while count_rows(path, "t1") == 0 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert count_rows(path, "t1") == 1
+    saver.close()
+
+def test_delete_thread(path):
+    saver = SqliteCheckpointSaver(path)
+    put(saver, "t1")
+    put(saver, "t2")
+    saver.delete_thread("t1")
+    assert saver.get_tuple(config("t1")) is None
+    assert saver.get_tuple(config("t2")) is not None
+    saver.close()
+
+def test_create_checkpointer(path):
+    assert isinstance(create_checkpointer(None), MemorySaver)
+    saver = create_checkpointer({"backend": "sqlite", "path": path, "batch_size": 4})
+    assert isinstance(saver, SqliteCheckpointSaver) and saver.batch_size == 4
+    saver.close()
+    with pytest.raises(ValueError):
+        create_checkpointer({"backend": "redis"})
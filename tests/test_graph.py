@@ -0,0 +1,55 @@
+import os
+import json
+import uuid
+import asyncio
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from bench.fake_llm import ScriptedChatModel
+from bench.run import subset_config
+from bench.stubs import stub_tools
+from graph.builder import build_graph
+from graph.checkpoint import SqliteCheckpointSaver
+from graph.factory import GraphFactory
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "agent_config.json")
+
+@pytest.fixture
+def config(tmp_path):
+    with open(CONFIG_PATH) as f:
+        config = json.load(f)
+    config = subset_config(config, 2, "config")
+    config["checkpointer"] = {"backend": "sqlite", "path": str(tmp_path / "checkpoints.sqlite")}
+    return config
+
+@pytest.fixture
+def graph(config):
+    with stub_tools():
+        graph = build_graph(ScriptedChatModel(hops=2), config)
+        yield graph
+        graph.close()
+        graph.checkpointer.close()
+
+def test_conversation_runs_offline(graph):
+    config = {"configurable": {"thread_id": uuid.uuid4().hex}}
+    state = graph.invoke({"messages": [HumanMessage(content="How is AAPL doing?")]}, config=config)
+    answers = [m for m in state["messages"] if isinstance(m, AIMessage) and m.content]
+    assert len(answers) >= 2
+    assert graph.get_state(config).values["messages"] == state["messages"]
+
+def test_conversation_runs_offline_async(graph):
+    config = {"configurable": {"thread_id": uuid.uuid4().hex}}
+    state = asyncio.run(graph.ainvoke({"messages": [HumanMessage(content="How is AAPL doing?")]}, config=config))
+    assert len(state["messages"]) > 1
+
+def test_factory_close_commits_checkpoints(config):
+    config["checkpointer"].update({"batch_size": 1000, "flush_interval_seconds": 60})
+    with stub_tools():
+        factory = GraphFactory(ScriptedChatModel(hops=1))
+        graph = factory.get(config)
+        run_config = {"configurable": {"thread_id": uuid.uuid4().hex}}
+        graph.invoke({"messages": [HumanMessage(content="How is AAPL doing?")]}, config=run_config)
+        factory.close()
+    assert factory.stats()["graphs"] == 0
+    saver = SqliteCheckpointSaver(config["checkpointer"]["path"])
+    assert saver.get_tuple(run_config) is not None
+    saver.close()
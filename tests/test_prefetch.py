@@ -0,0 +1,33 @@
+from langchain_core.messages import HumanMessage
+from langchain_core.tools import tool
+from bench.stubs import stub_tools
+from graph.instrumentation import Instrumentation
+from graph.prefetch import Prefetcher, PrefetchRule
+from tools.cache import TTLCache
+from tools.tool_registry import TOOL_REGISTRY
+
+def test_prefetched_calls_are_instrumented():
+    cache = TTLCache("prefetch_test")
+
+    @tool
+    def alpha_vantage(ticker: str) -> str:
+        """Returns a price."""
+        return cache.get_or_compute(ticker, lambda: f"{ticker} price", ttl=60)
+
+    # stub_tools restores the registry afterwards
+    with stub_tools():
+        TOOL_REGISTRY["alpha_vantage"] = alpha_vantage
+        instrumentation = Instrumentation()
+        prefetcher = Prefetcher([PrefetchRule(agent="FinancialAgent", tool="alpha_vantage",
+                                              pattern=r"\$([A-Za-z]{1,5})\b")])
+        supervisor, _ = instrumentation.wrap_node(
+            "Supervisor", *prefetcher.wrap_supervisor(lambda state: {"next": "FinancialAgent"}, None)
+        )
+        config = {"configurable": {"thread_id": "t1"}}
+        supervisor({"messages": [HumanMessage(content="How are $TSLA and $AAPL doing?")]}, config)
+
+        messages = prefetcher.messages_for(config, "FinancialAgent")
+        assert sorted(m.content for m in messages[1:]) == ["AAPL price", "TSLA price"]
+        cache_events = [e for e in instrumentation.events if e["type"] == "cache"]
+        assert [(e["name"], e["thread_id"], e["result"]) for e in cache_events] == [("prefetch_test", "t1", "miss")] * 2
+        prefetcher.close()
@@ -0,0 +1,22 @@
+from graph.state import TurnCounter, add_turn_counts
+
+def test_add_turn_counts_adds_deltas():
+    assert add_turn_counts((1, 0, 2), (0, 1, 0)) == (1, 1, 2)
+
+def test_add_turn_counts_pads_shorter_tuples():
+    assert add_turn_counts((1,), (0, 0, 1)) == (1, 0, 1)
+    assert add_turn_counts((1, 2, 3), (1,)) == (2, 2, 3)
+
+def test_add_turn_counts_starts_from_empty():
+    assert add_turn_counts((), (0, 1)) == (0, 1)
+
+def test_empty_update_resets_the_counts():
+    assert add_turn_counts((3, 4), ()) == ()
+
+def test_turn_counter_merges_parallel_branches():
+    counter = TurnCounter(["A", "B"])
+    counts = add_turn_counts((), counter.increment("A"))
+    counts = add_turn_counts(counts, counter.increment("B"))
+    counts = add_turn_counts(counts, counter.increment("A"))
+    assert counter.as_dict(counts) == {"A": 2, "B": 1}
+    assert counter.get((), "B") == 0
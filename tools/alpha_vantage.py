@@ -1,10 +1,42 @@
 import os
+from typing import Any, Dict
 from langchain_core.tools import BaseTool
 from langchain_community.utilities.alpha_vantage import AlphaVantageAPIWrapper
 from dotenv import load_dotenv
+from tools.cache import TTLCache
+from tools.market_hours import seconds_until_market_close
+from tools.timeseries import summarize
+from tools.transport import REQUESTS_TIMEOUT, get_session
 
 load_dotenv()
 
+# Shared across every tool instance and thread; set ALPHAVANTAGE_CACHE_PATH to
+# persist responses to a local SQLite file shared between processes.
+alpha_vantage_cache = TTLCache(
+    "alpha_vantage",
+    max_entries=int(os.environ.get("ALPHAVANTAGE_CACHE_SIZE", "256")),
+    path=os.environ.get("ALPHAVANTAGE_CACHE_PATH"),
+)
+
+class PooledAlphaVantageAPIWrapper(AlphaVantageAPIWrapper):
+    """Alpha Vantage API wrapper that reuses the shared keep-alive session."""
+
+    def _get_time_series_daily(self, symbol: str) -> Dict[str, Any]:
+        response = get_session().get(
+            "https://www.alphavantage.co/query/",
+            params={
+                "function": "TIME_SERIES_DAILY",
+                "symbol": symbol,
+                "apikey": self.alphavantage_api_key,
+            },
+            timeout=REQUESTS_TIMEOUT,
+        )
+        response.raise_for_status()
+        data = response.json()
+        if "Error Message" in data:
+            raise ValueError(f"API Error: {data['Error Message']}")
+        return data
+
 class AlphaVantageQueryRun(BaseTool):
     """Tool that queries the Alpha Vantage API."""
 
@@ -13,12 +45,23 @@ class AlphaVantageQueryRun(BaseTool):
         "A wrapper around Alpha Vantage API. "
         "Useful for getting financial information about stocks, "
         "forex, cryptocurrencies, and economic indicators. "
-        "Input should be the name of the stock ticker."
+        "Input should be the name of the stock ticker. "
+        "Returns a summary of the daily prices (latest prices, returns, ranges, "
+        "averages and volatility over recent windows) and a handle to the full series."
     )
-    api_wrapper: AlphaVantageAPIWrapper = AlphaVantageAPIWrapper(alphavantage_api_key=os.environ.get("ALPHAVANTAGE_API_KEY"))
+    api_wrapper: AlphaVantageAPIWrapper = PooledAlphaVantageAPIWrapper(alphavantage_api_key=os.environ.get("ALPHAVANTAGE_API_KEY"))
 
     def _run(self, ticker: str) -> str:
         """Use the tool."""
-        return self.api_wrapper._get_time_series_daily(ticker)
+        symbol = ticker.strip().upper()
+        data = alpha_vantage_cache.get_or_compute(
+            f"TIME_SERIES_DAILY:{symbol}",
+            lambda: self.api_wrapper._get_time_series_daily(symbol),
+            ttl=seconds_until_market_close,
+            # Rate-limit notices come back as regular JSON; only cache real series
+            should_cache=lambda data: "Time Series (Daily)" in data,
+        )
+        # Only a compact summary goes to the model; the full series stays behind a handle
+        return summarize(data, symbol)
 
 alpha_vantage_tool = AlphaVantageQueryRun()
@@ -0,0 +1,198 @@
+"""
+Shared TTL cache for tool responses.
+
+`TTLCache` keeps recent entries in memory with LRU eviction and can write
+them through to a local SQLite file, so cached responses survive restarts
+and are shared by every process that points at the same file. Concurrent
+requests for the same key are coalesced: the first caller computes the
+value, the others wait for its result instead of calling upstream again.
+"""
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Optional, Union
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Callables notified as listener(cache_name, result) on every lookup through
+# get_or_compute, where result is "hit", "miss" or "coalesced"
+_listeners = []
+
+def add_cache_listener(listener: Callable[[str, str], None]) -> None:
+    """Registers a callable notified of every cache hit, miss and coalesced request."""
+    _listeners.append(listener)
+
+def _notify(cache_name: str, result: str) -> None:
+    for listener in _listeners:
+        listener(cache_name, result)
+
+class TTLCache:
+    """
+    In-memory LRU cache with per-entry expiry and an optional SQLite store.
+
+    Args:
+        name (str): Name of the cache, used as the table name on disk.
+        max_entries (int): Maximum number of entries kept in memory.
+        path (str): Optional SQLite file to persist entries to. Values must
+                    be JSON-serializable when a path is set.
+    """
+
+    def __init__(self, name: str, max_entries: int = 256, path: Optional[str] = None):
+        self.name = name
+        self.max_entries = max_entries
+        self.path = path
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        # Serializes use of the SQLite connection, so disk reads and writes
+        # never block lookups that are served from memory
+        self._db_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                f'CREATE TABLE IF NOT EXISTS "{name}" '
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def get(self, key: str) -> tuple[bool, Any]:
+        """
+        Looks up a key in memory, then on disk.
+
+        Returns:
+            tuple: (found, value). Expired entries are treated as missing.
+        """
+        now = time.time()
+        with self._lock:
+            found, value = self._memory_get(key, now)
+            if found or self._db is None:
+                return found, value
+        with self._db_lock:
+            row = self._db.execute(
+                f'SELECT value, expires_at FROM "{self.name}" WHERE key = ?', (key,)
+            ).fetchone()
+        if row is None or row[1] <= now:
+            return False, None
+        value = json.loads(row[0])
+        with self._lock:
+            self._remember(key, value, row[1])
+        return True, value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        """Stores a value that expires after `ttl` seconds."""
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._remember(key, value, expires_at)
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute(
+                    f'INSERT OR REPLACE INTO "{self.name}" (key, value, expires_at) VALUES (?, ?, ?)',
+                    (key, json.dumps(value), expires_at),
+                )
+                # Drop expired rows so the file does not grow without bound
+                self._db.execute(f'DELETE FROM "{self.name}" WHERE expires_at <= ?', (time.time(),))
+                self._db.commit()
+
+    def _memory_get(self, key: str, now: float) -> tuple[bool, Any]:
+        # Caller holds the lock
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                return True, value
+            del self._entries[key]
+        return False, None
+
+    def _remember(self, key, value, expires_at):
+        # Caller holds the lock
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Any],
+        ttl: Union[float, Callable[[], float]],
+        should_cache: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """
+        Returns the cached value for `key`, computing it once if missing.
+
+        Concurrent callers asking for the same missing key share a single
+        call to `compute`. Errors are propagated to every waiting caller and
+        are never cached.
+
+        Args:
+            key (str): The cache key.
+            compute (Callable): Produces the value on a miss.
+            ttl (float | Callable): Lifetime in seconds, or a callable that
+                                    returns it at the time the value is stored.
+            should_cache (Callable): Optional predicate; values for which it
+                                     returns False are returned but not stored.
+        """
+        found, value = self.get(key)
+        if found:
+            with self._lock:
+                self.hits += 1
+            _notify(self.name, "hit")
+            return value
+
+        with self._lock:
+            # A leader may have stored the value and left _inflight since the
+            # lookup above; check again before becoming a new leader
+            found, value = self._memory_get(key, time.time())
+            if found:
+                self.hits += 1
+            else:
+                future = self._inflight.get(key)
+                leader = future is None
+                if leader:
+                    future = Future()
+                    self._inflight[key] = future
+                    self.misses += 1
+                else:
+                    self.coalesced += 1
+        if found:
+            _notify(self.name, "hit")
+            return value
+        _notify(self.name, "miss" if leader else "coalesced")
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = compute()
+            if should_cache is None or should_cache(value):
+                self.set(key, value, ttl() if callable(ttl) else ttl)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        """Returns hit, miss and coalesced-request counters."""
+        with self._lock:
+            return {
+                "name": self.name,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+            }
@@ -0,0 +1,30 @@
+"""
+US equity market hours, used to expire data that is refreshed once a day.
+"""
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# US equity markets close at 16:00 New York time; daily series are refreshed
+# shortly after, so cached entries expire a little after the next close.
+MARKET_CLOSE_HOUR = 16
+REFRESH_DELAY = timedelta(minutes=15)
+
+try:
+    MARKET_TZ = ZoneInfo("America/New_York")
+except ZoneInfoNotFoundError:
+    # No tz database available (e.g. Windows without tzdata); assume EST
+    MARKET_TZ = timezone(timedelta(hours=-5))
+
+def seconds_until_market_close(now: datetime = None) -> float:
+    """
+    Returns the number of seconds until daily data is next refreshed, i.e. a
+    short delay after the next weekday market close. Market holidays are not
+    taken into account, which only costs one extra upstream call.
+    """
+    now = now or datetime.now(MARKET_TZ)
+    refresh = now.replace(hour=MARKET_CLOSE_HOUR, minute=0, second=0, microsecond=0) + REFRESH_DELAY
+    if refresh <= now:
+        refresh += timedelta(days=1)
+    while refresh.weekday() >= 5:
+        refresh += timedelta(days=1)
+    return (refresh - now).total_seconds()
@@ -0,0 +1,42 @@
+"""
+Python REPL tool that runs code in the sandbox process pool.
+
+Drop-in replacement for `PythonREPLTool` from langchain_experimental: same
+name and input, but the code runs in a sandbox worker with a timeout and a
+memory limit instead of in the server process.
+"""
+import re
+import logging
+from typing import Optional
+from langchain_core.callbacks import CallbackManagerForToolRun
+from langchain_core.tools import BaseTool
+from tools.sandbox import get_sandbox_pool
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def sanitize_input(query: str) -> str:
+    """Removes surrounding whitespace, backticks and a leading `python`."""
+    query = re.sub(r"^(\s|`)*(?i:python)?\s*", "", query)
+    query = re.sub(r"(\s|`)*$", "", query)
+    return query
+
+class SandboxedPythonREPLTool(BaseTool):
+    """Tool for running Python code in a sandboxed worker process."""
+
+    name: str = "Python_REPL"
+    description: str = (
+        "A Python shell. Use this to execute python commands. "
+        "Input should be a valid python command. "
+        "If you want to see the output of a value, you should print it out "
+        "with `print(...)`. Every call starts from a fresh namespace, so "
+        "include the imports and definitions the code needs. "
+        "load_series(handle) loads a price series returned by the alpha_vantage tool."
+    )
+
+    def _run(self, query: str, run_manager: Optional[CallbackManagerForToolRun] = None) -> str:
+        result = get_sandbox_pool().run(sanitize_input(query))
+        if result["error"] is not None:
+            logger.debug(f"Python_REPL code raised: {result['error']}")
+            return result["output"] + result["error"]
+        return result["output"]
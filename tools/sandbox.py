@@ -0,0 +1,276 @@
+"""
+Sandboxed process pool for running generated Python code.
+
+Code written by the agents (REPL snippets and matplotlib plots) is executed in
+a pool of pre-started worker processes instead of the server process. Every
+worker is a fresh interpreter that has already imported matplotlib with the
+Agg backend, runs under an address-space limit, and handles one job at a
+time, so concurrent requests never share pyplot state and rendering runs on
+other cores. Jobs can call `load_series(handle)` to read a price series
+saved by the alpha_vantage tool (see `tools.timeseries`). A job that exceeds
+its timeout is killed together with its worker, which is replaced by a new
+one.
+
+Workers talk to the pool over their stdin/stdout pipes using length-prefixed
+frames: a JSON frame per job and per result, followed by a raw bytes frame
+for the rendered image, if any. The worker runs untrusted code, so nothing it
+sends back is unpickled or otherwise executed, oversized frames are
+rejected, and a result that is not complete before the timeout counts as a
+timeout. Workers only see a minimal environment (`_WORKER_ENV`), so API keys
+of the server process are not readable by the code they run. The pool is
+created on first use and sized from the environment:
+
+- `SANDBOX_WORKERS`: number of worker processes (default: CPU count, up to 4),
+- `SANDBOX_TIMEOUT`: seconds a job may run (default: 30),
+- `SANDBOX_MEMORY_MB`: address-space limit per worker (default: 2048).
+"""
+import io
+import os
+import sys
+import json
+import queue
+import atexit
+import struct
+import logging
+import threading
+import subprocess
+import contextlib
+from typing import Optional
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+SANDBOX_WORKERS = int(os.getenv("SANDBOX_WORKERS", min(4, os.cpu_count() or 1)))
+SANDBOX_TIMEOUT = float(os.getenv("SANDBOX_TIMEOUT", "30"))
+SANDBOX_MEMORY_MB = int(os.getenv("SANDBOX_MEMORY_MB", "2048"))
+
+# Variables passed on to the workers, in addition to the locale (LC_*); the
+# rest of the environment, API keys included, stays in the server process
+_WORKER_ENV = ("PATH", "LANG", "LANGUAGE", "TMPDIR", "TEMP", "TMP", "TIMESERIES_DIR", "MPLCONFIGDIR",
+               "SYSTEMROOT")
+
+_HEADER = struct.Struct("!Q")
+# Largest frame accepted from the other end of the pipe
+_MAX_FRAME = 256 * 1024 * 1024
+
+def _send_bytes(stream, payload: bytes) -> None:
+    stream.write(_HEADER.pack(len(payload)) + payload)
+
+def _recv_bytes(stream) -> bytes:
+    header = stream.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        raise EOFError("sandbox worker closed its pipe")
+    (size,) = _HEADER.unpack(header)
+    if size > _MAX_FRAME:
+        raise ValueError(f"sandbox frame of {size} bytes exceeds the limit")
+    payload = stream.read(size)
+    if len(payload) < size:
+        raise EOFError("sandbox worker closed its pipe")
+    return payload
+
+def _send(stream, obj) -> None:
+    _send_bytes(stream, json.dumps(obj).encode("utf-8"))
+    stream.flush()
+
+def _recv(stream):
+    return json.loads(_recv_bytes(stream))
+
+def _send_result(stream, result: dict) -> None:
+    # The image travels as a raw frame after the JSON one
+    image = result["image"]
+    _send_bytes(stream, json.dumps({
+        "output": result["output"],
+        "error": result["error"],
+        "image": image is not None,
+    }).encode("utf-8"))
+    if image is not None:
+        _send_bytes(stream, image)
+    stream.flush()
+
+def _recv_result(stream) -> dict:
+    # Only accept the expected shape; anything else is a protocol error
+    header = _recv(stream)
+    if not isinstance(header, dict) or not isinstance(header.get("output"), str) \
+            or not isinstance(header.get("error"), (str, type(None))):
+        raise ValueError("malformed sandbox result")
+    image = _recv_bytes(stream) if header.get("image") is True else None
+    return {"output": header["output"], "error": header["error"], "image": image}
+
+class SandboxPool:
+    """
+    Pool of pre-started worker processes that execute Python code.
+
+    Args:
+        workers (int): Number of worker processes.
+        timeout (float): Default number of seconds a job may run.
+        memory_mb (int): Address-space limit of each worker, in megabytes.
+    """
+
+    def __init__(self, workers: int = SANDBOX_WORKERS, timeout: float = SANDBOX_TIMEOUT,
+                 memory_mb: int = SANDBOX_MEMORY_MB):
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self._idle = queue.Queue()
+        self._closed = False
+        # Start every worker now so the imports happen before the first job
+        for _ in range(max(1, workers)):
+            self._idle.put(self._spawn())
+        atexit.register(self.close)
+
+    def _spawn(self) -> subprocess.Popen:
+        # Run the worker as a module of this project, whatever the current directory is
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = {name: value for name, value in os.environ.items()
+               if name in _WORKER_ENV or name.startswith("LC_")}
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")]))
+        return subprocess.Popen(
+            [sys.executable, "-m", "tools.sandbox", str(self.memory_mb)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env=env,
+        )
+
+    def _replace(self, worker: subprocess.Popen) -> None:
+        worker.kill()
+        worker.wait()
+        if not self._closed:
+            self._idle.put(self._spawn())
+
+    @staticmethod
+    def _read_result(worker: subprocess.Popen, results: queue.Queue) -> None:
+        # Ends with an EOFError once a timed out worker has been killed
+        try:
+            results.put(_recv_result(worker.stdout))
+        except Exception as e:
+            results.put(e)
+
+    def run(self, code: str, image_format: Optional[str] = None, timeout: Optional[float] = None) -> dict:
+        """
+        Executes `code` in a worker process.
+
+        Args:
+            code (str): The Python code to run.
+            image_format (str): If set (e.g. "jpeg"), the current matplotlib
+                                figure is rendered in this format after the
+                                code has run.
+            timeout (float): Seconds the job may run; defaults to the pool's.
+
+        Returns:
+            dict: "output" (everything printed), "error" (the exception, or
+                  None) and "image" (the rendered figure bytes, or None).
+        """
+        if self._closed:
+            raise RuntimeError("The sandbox pool is closed.")
+        timeout = self.timeout if timeout is None else timeout
+        worker = self._idle.get()
+        healthy = False
+        try:
+            _send(worker.stdin, {"code": code, "image_format": image_format})
+            # The worker may still be importing matplotlib if it was just
+            # started. The whole result is read on a thread, so the timeout
+            # also covers a worker that stops in the middle of a frame.
+            results = queue.Queue(maxsize=1)
+            threading.Thread(target=self._read_result, args=(worker, results), daemon=True).start()
+            try:
+                result = results.get(timeout=timeout)
+            except queue.Empty:
+                logger.warning(f"Sandbox job timed out after {timeout} seconds; replacing worker {worker.pid}")
+                return {"output": "", "error": f"Execution timed out after {timeout} seconds", "image": None}
+            if isinstance(result, Exception):
+                raise result
+            healthy = True
+            return result
+        except (EOFError, OSError) as e:
+            logger.error(f"Sandbox worker {worker.pid} exited unexpectedly: {e}")
+            return {"output": "", "error": "The sandbox worker exited unexpectedly", "image": None}
+        except ValueError as e:
+            logger.error(f"Sandbox worker {worker.pid} sent an invalid result: {e}")
+            return {"output": "", "error": "The sandbox worker sent an invalid result", "image": None}
+        finally:
+            if healthy:
+                self._idle.put(worker)
+            else:
+                self._replace(worker)
+
+    def close(self) -> None:
+        """Stops every idle worker. Jobs still running finish first."""
+        self._closed = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            with contextlib.suppress(OSError):
+                _send(worker.stdin, None)
+                worker.stdin.close()
+            try:
+                worker.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                worker.kill()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_sandbox_pool() -> SandboxPool:
+    """Returns the process-wide sandbox pool, starting it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SandboxPool()
+        return _pool
+
+def _limit_memory(memory_mb: int) -> None:
+    try:
+        import resource
+    except ImportError:
+        # Not available on Windows; jobs still time out but memory is not limited
+        return
+    limit = memory_mb * 1024 * 1024
+    with contextlib.suppress(ValueError, OSError):
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def _run_job(job: dict, plt, load_series) -> dict:
+    result = {"output": "", "error": None, "image": None}
+    output = io.StringIO()
+    # Every job draws on a figure of its own
+    plt.close("all")
+    plt.figure()
+    try:
+        with contextlib.redirect_stdout(output):
+            exec(job["code"], {"__name__": "__main__", "plt": plt, "load_series": load_series})
+        if job.get("image_format"):
+            image = io.BytesIO()
+            plt.savefig(image, format=job["image_format"])
+            result["image"] = image.getvalue()
+    except BaseException as e:
+        # Includes MemoryError from the address-space limit and SystemExit
+        result["error"] = repr(e)
+    finally:
+        plt.close("all")
+    result["output"] = output.getvalue()
+    return result
+
+def _serve(memory_mb: int) -> None:
+    # Keep the original stdout for the protocol and send anything written
+    # directly to file descriptor 1 to stderr instead
+    channel_in = sys.stdin.buffer
+    channel_out = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from tools.timeseries import load_series
+    _limit_memory(memory_mb)
+
+    while True:
+        try:
+            job = _recv(channel_in)
+        except EOFError:
+            break
+        if job is None:
+            break
+        _send_result(channel_out, _run_job(job, plt, load_series))
+
+if __name__ == "__main__":
+    _serve(int(sys.argv[1]) if len(sys.argv) > 1 else SANDBOX_MEMORY_MB)
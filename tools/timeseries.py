@@ -0,0 +1,160 @@
+"""
+Columnar daily price series and their compact summaries.
+
+The Alpha Vantage daily series is a large JSON object of per-day string
+fields. `DailySeries` parses it once into NumPy arrays (oldest day first) and
+answers the usual derived questions, such as returns, moving averages, price
+ranges and volatility over a window, with vectorized math. The model only
+sees `summarize`'s compact summary; the full arrays are written once to an
+`.npz` file whose path is the series' handle. Code running in the sandbox
+reads it with `load_series(handle)` instead of having the data copied into
+its prompt.
+
+Handles live in `TIMESERIES_DIR` (default: "timeseries" in the temp
+directory).
+"""
+import os
+import json
+import tempfile
+from typing import Optional, Sequence, Tuple
+import numpy as np
+
+TIMESERIES_DIR = os.getenv("TIMESERIES_DIR", os.path.join(tempfile.gettempdir(), "timeseries"))
+
+# Trading days in roughly a week, a month, a quarter and a year
+SUMMARY_WINDOWS = (5, 20, 60, 252)
+TRADING_DAYS_PER_YEAR = 252
+
+FIELDS = ("open", "high", "low", "close", "volume")
+_ALPHA_VANTAGE_FIELDS = ("1. open", "2. high", "3. low", "4. close", "5. volume")
+
+class DailySeries:
+    """
+    Daily open, high, low, close and volume arrays of one symbol, oldest day first.
+
+    Args:
+        symbol (str): The ticker symbol.
+        dates (np.ndarray): Trading days as datetime64[D].
+        open, high, low, close, volume (np.ndarray): float64 arrays of the
+                                                     same length as `dates`.
+    """
+
+    def __init__(self, symbol: str, dates: np.ndarray, open: np.ndarray, high: np.ndarray,
+                 low: np.ndarray, close: np.ndarray, volume: np.ndarray):
+        self.symbol = symbol
+        self.dates = dates
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+    @classmethod
+    def from_alpha_vantage(cls, data: dict, symbol: Optional[str] = None) -> "DailySeries":
+        """Parses a TIME_SERIES_DAILY response."""
+        series = data["Time Series (Daily)"]
+        days = sorted(series)
+        values = np.array([[series[day][field] for field in _ALPHA_VANTAGE_FIELDS] for day in days],
+                          dtype=np.float64).reshape(len(days), len(FIELDS))
+        symbol = symbol or data.get("Meta Data", {}).get("2. Symbol", "")
+        return cls(symbol, np.array(days, dtype="datetime64[D]"), *values.T.copy())
+
+    @classmethod
+    def load(cls, handle: str) -> "DailySeries":
+        """Reads a series written by `save`."""
+        with np.load(handle) as arrays:
+            return cls(str(arrays["symbol"]), arrays["dates"], *(arrays[field] for field in FIELDS))
+
+    def save(self, directory: str = TIMESERIES_DIR) -> str:
+        """
+        Writes the series to an `.npz` file, once per symbol and last trading day.
+
+        Returns:
+            str: The file path, which serves as the series' handle.
+        """
+        os.makedirs(directory, exist_ok=True)
+        last = str(self.dates[-1]) if len(self) else "empty"
+        handle = os.path.join(directory, f"{self.symbol}-{last}.npz")
+        if not os.path.exists(handle):
+            # Write to a temporary file first so readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".npz")
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, symbol=self.symbol, dates=self.dates,
+                         **{field: getattr(self, field) for field in FIELDS})
+            os.replace(tmp_path, handle)
+        return handle
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def daily_returns(self) -> np.ndarray:
+        """Close-to-close returns, one shorter than the series."""
+        return np.diff(self.close) / self.close[:-1]
+
+    def total_return(self, days: int) -> float:
+        """Return from the close `days` trading days ago to the latest close."""
+        days = min(days, len(self) - 1)
+        return float(self.close[-1] / self.close[-1 - days] - 1) if days > 0 else 0.0
+
+    def moving_average(self, days: int) -> np.ndarray:
+        """Simple moving average of the close, one value per complete window."""
+        cumulative = np.cumsum(np.insert(self.close, 0, 0.0))
+        return (cumulative[days:] - cumulative[:-days]) / days
+
+    def price_range(self, days: int) -> Tuple[float, float]:
+        """Lowest low and highest high over the last `days` trading days."""
+        return float(self.low[-days:].min()), float(self.high[-days:].max())
+
+    def volatility(self, days: int) -> float:
+        """Annualized standard deviation of the daily returns over the last `days` trading days."""
+        returns = self.daily_returns()[-days:]
+        if len(returns) < 2:
+            return 0.0
+        return float(returns.std(ddof=1) * np.sqrt(TRADING_DAYS_PER_YEAR))
+
+    def summary(self, windows: Sequence[int] = SUMMARY_WINDOWS) -> dict:
+        """Latest prices and per-window return, range, average close and volume, and volatility."""
+        if not len(self):
+            return {"symbol": self.symbol, "days": 0}
+        summary = {
+            "symbol": self.symbol,
+            "days": len(self),
+            "from": str(self.dates[0]),
+            "to": str(self.dates[-1]),
+            "latest": {field: round(float(getattr(self, field)[-1]), 4) for field in FIELDS},
+            "change_1d_pct": round(self.total_return(1) * 100, 2),
+            "windows": {},
+        }
+        for days in windows:
+            # Windows longer than the series are left out rather than truncated
+            if days >= len(self):
+                continue
+            low, high = self.price_range(days)
+            summary["windows"][f"{days}d"] = {
+                "return_pct": round(self.total_return(days) * 100, 2),
+                "low": round(low, 4),
+                "high": round(high, 4),
+                "avg_close": round(float(self.moving_average(days)[-1]), 4),
+                "avg_volume": round(float(self.volume[-days:].mean())),
+                "volatility_pct": round(self.volatility(days) * 100, 2),
+            }
+        return summary
+
+def load_series(handle: str) -> DailySeries:
+    """Loads the full series behind a handle returned by the alpha_vantage tool."""
+    return DailySeries.load(handle)
+
+def summarize(data: dict, symbol: Optional[str] = None) -> str:
+    """
+    Returns the compact JSON summary of a TIME_SERIES_DAILY response, with the
+    handle of the full series, or the response itself if it holds no series
+    (e.g. a rate-limit notice).
+    """
+    if "Time Series (Daily)" not in data:
+        return json.dumps(data)
+    series = DailySeries.from_alpha_vantage(data, symbol)
+    summary = series.summary()
+    summary["handle"] = series.save()
+    summary["usage"] = ("Full daily series: in Python code, load_series(handle) returns an object "
+                        "with dates, open, high, low, close and volume NumPy arrays, oldest day first.")
+    return json.dumps(summary)
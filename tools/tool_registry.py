@@ -1,19 +1,108 @@
-from tools.alpha_vantage import alpha_vantage_tool
-from tools.date import get_current_date
-from tools.save_graph_tool import execute_and_save_graph_tool
-from langchain_tavily import TavilySearch
-from langchain_experimental.tools import PythonREPLTool
-
-
-# Instantiate tools that require setup
-tavily_tool = TavilySearch(max_results=5)
-python_repl_tool = PythonREPLTool()
-
-# Map tool names to actual tool instances
-TOOL_REGISTRY = {
-    "alpha_vantage": alpha_vantage_tool,
-    "get_current_date": get_current_date,
-    "tavily_search": tavily_tool,
-    "python_repl": python_repl_tool,
-    "execute_and_save_graph_tool": execute_and_save_graph_tool
-}
+"""
+Central registry of the tools agents can use, keyed by the names used in
+`agent_config.json`.
+
+Tools are registered as factories and only imported and built the first
+time they are looked up, so a process only pays for (and only needs the API
+keys of) the tools its configured agents actually use.
+"""
+import threading
+from collections.abc import MutableMapping
+from typing import Callable, Dict
+from langchain_core.tools import BaseTool
+
+class LazyToolRegistry(MutableMapping):
+    """
+    Mapping of tool names to tools that builds each tool on first access.
+
+    Assigning a tool instance (`registry[name] = tool`) registers it as is;
+    `register` adds a factory instead. Membership tests, iteration and
+    `copy` never build a tool.
+    """
+
+    def __init__(self, factories: Dict[str, Callable[[], BaseTool]] = None):
+        self._factories = dict(factories or {})
+        self._instances = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory: Callable[[], BaseTool]) -> None:
+        """Registers a zero-argument callable that builds the tool `name`."""
+        with self._lock:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+
+    def __getitem__(self, name: str) -> BaseTool:
+        with self._lock:
+            if name not in self._instances:
+                self._instances[name] = self._factories[name]()
+            return self._instances[name]
+
+    def __setitem__(self, name: str, tool: BaseTool) -> None:
+        with self._lock:
+            self._factories[name] = lambda: tool
+            self._instances[name] = tool
+
+    def __delitem__(self, name: str) -> None:
+        with self._lock:
+            del self._factories[name]
+            self._instances.pop(name, None)
+
+    def __contains__(self, name) -> bool:
+        return name in self._factories
+
+    def __iter__(self):
+        return iter(list(self._factories))
+
+    def __len__(self) -> int:
+        return len(self._factories)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._factories.clear()
+            self._instances.clear()
+
+    def update(self, other=(), **kwargs) -> None:
+        # Copy another registry's factories without building its tools
+        if isinstance(other, LazyToolRegistry):
+            with other._lock:
+                factories, instances = dict(other._factories), dict(other._instances)
+            with self._lock:
+                self._factories.update(factories)
+                self._instances.update(instances)
+            other = ()
+        super().update(other, **kwargs)
+
+    def copy(self) -> "LazyToolRegistry":
+        """Returns a registry with the same factories and already built tools."""
+        registry = LazyToolRegistry()
+        registry.update(self)
+        return registry
+
+def _alpha_vantage():
+    from tools.alpha_vantage import alpha_vantage_tool
+    return alpha_vantage_tool
+
+def _get_current_date():
+    from tools.date import get_current_date
+    return get_current_date
+
+def _tavily_search():
+    from tools.web_search import create_tavily_search
+    return create_tavily_search(max_results=5)
+
+def _python_repl():
+    from tools.python_repl import SandboxedPythonREPLTool
+    return SandboxedPythonREPLTool()
+
+def _execute_and_save_graph_tool():
+    from tools.save_graph_tool import execute_and_save_graph_tool
+    return execute_and_save_graph_tool
+
+# Map tool names to the factories that create them
+TOOL_REGISTRY = LazyToolRegistry({
+    "alpha_vantage": _alpha_vantage,
+    "get_current_date": _get_current_date,
+    "tavily_search": _tavily_search,
+    "python_repl": _python_repl,
+    "execute_and_save_graph_tool": _execute_and_save_graph_tool
+})
@@ -0,0 +1,81 @@
+"""
+Shared HTTP transport for the tools and the LLM client.
+
+Every outbound request goes through one of three process-wide clients, so
+TLS connections are kept alive and reused across agent hops instead of being
+set up again for every call:
+
+- a `requests` session for the sync tools (Alpha Vantage, Tavily),
+- an `httpx` client for the sync OpenAI client,
+- an `httpx` async client for the async OpenAI client and async Tavily calls.
+
+The clients are created on first use and sized from the environment:
+
+- `HTTP_POOL_SIZE`: connections kept per host; further requests to a busy
+  host wait for a free connection, which caps outbound concurrency per host
+  (default: 20),
+- `HTTP_MAX_CONNECTIONS`: connections per httpx client across all hosts
+  (default: 100),
+- `HTTP_TIMEOUT`: seconds to wait for a response (default: 60),
+- `HTTP_CONNECT_TIMEOUT`: seconds to wait for a connection (default: 10).
+
+The async client is bound to the event loop it is first used on; use it from
+a single loop per process.
+"""
+import os
+import threading
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+
+# (connect, read) timeout passed to every request made through the session
+REQUESTS_TIMEOUT = (HTTP_CONNECT_TIMEOUT, HTTP_TIMEOUT)
+
+_session = None
+_http_client = None
+_async_http_client = None
+_lock = threading.Lock()
+
+def _limits() -> httpx.Limits:
+    # httpx has no per-host limit; keep-alive connections are capped at the per-host size
+    return httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_POOL_SIZE)
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+
+def get_session() -> requests.Session:
+    """Returns the process-wide `requests` session with a bounded keep-alive pool per host."""
+    global _session
+    with _lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, pool_block=True)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+def get_http_client() -> httpx.Client:
+    """Returns the process-wide sync `httpx` client."""
+    global _http_client
+    with _lock:
+        if _http_client is None:
+            _http_client = httpx.Client(limits=_limits(), timeout=_timeout())
+        return _http_client
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Returns the process-wide async `httpx` client."""
+    global _async_http_client
+    with _lock:
+        if _async_http_client is None:
+            _async_http_client = httpx.AsyncClient(limits=_limits(), timeout=_timeout())
+        return _async_http_client
+
+def llm_http_clients() -> dict:
+    """Keyword arguments that make a `ChatOpenAI` model use the shared clients."""
+    return {"http_client": get_http_client(), "http_async_client": get_async_http_client()}
@@ -0,0 +1,41 @@
+from typing import Any, Dict
+from langchain_tavily import TavilySearch
+from langchain_tavily._utilities import TAVILY_API_URL, TavilySearchAPIWrapper
+from tools.transport import REQUESTS_TIMEOUT, get_async_http_client, get_session
+
+class PooledTavilySearchAPIWrapper(TavilySearchAPIWrapper):
+    """Tavily Search API wrapper that sends its requests through the shared HTTP clients."""
+
+    def _request(self, query: str, kwargs: Dict[str, Any]):
+        params = {"query": query, **kwargs}
+        params = {k: v for k, v in params.items() if v is not None}
+        headers = {
+            "Authorization": f"Bearer {self.tavily_api_key.get_secret_value()}",
+            "Content-Type": "application/json",
+            "X-Client-Source": "langchain-tavily",
+        }
+        return f"{self.api_base_url or TAVILY_API_URL}/search", params, headers
+
+    @staticmethod
+    def _error(status_code: int, body: dict) -> ValueError:
+        detail = body.get("detail", {})
+        error_message = detail.get("error") if isinstance(detail, dict) else "Unknown error"
+        return ValueError(f"Error {status_code}: {error_message}")
+
+    def raw_results(self, query: str, **kwargs: Any) -> Dict[str, Any]:
+        url, params, headers = self._request(query, kwargs)
+        response = get_session().post(url, json=params, headers=headers, timeout=REQUESTS_TIMEOUT)
+        if response.status_code != 200:
+            raise self._error(response.status_code, response.json())
+        return response.json()
+
+    async def raw_results_async(self, query: str, **kwargs: Any) -> Dict[str, Any]:
+        url, params, headers = self._request(query, kwargs)
+        response = await get_async_http_client().post(url, json=params, headers=headers)
+        if response.status_code != 200:
+            raise self._error(response.status_code, response.json())
+        return response.json()
+
+def create_tavily_search(max_results: int = 5) -> TavilySearch:
+    """Creates the Tavily search tool on the shared HTTP clients."""
+    return TavilySearch(max_results=max_results, api_wrapper=PooledTavilySearchAPIWrapper())